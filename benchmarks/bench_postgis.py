@@ -0,0 +1,80 @@
+"""
+Benchmarks for PostGIS reads and writes (see conftest.py for where the
+database comes from).
+
+    python -m pytest benchmarks/bench_postgis.py --bench-rows 10000,100000
+"""
+import pytest
+from datasets import GEOM_TYPES, POSTGIS_GEOM_TYPES, SRID, make_rows
+
+WRITE_METHODS = ('insert', 'values', 'copy')
+CHUNK_SIZES = (1000, 10000)
+
+TABLE_DDL = '''
+    CREATE TABLE {name} (
+        id serial PRIMARY KEY,
+        name text,
+        value numeric,
+        created timestamp,
+        shape geometry({geom_type}, {srid})
+    )
+'''
+
+def create_table(db, name, geom_type):
+    db.execute('DROP TABLE IF EXISTS {}'.format(name))
+    db.execute(TABLE_DDL.format(name=name, \
+        geom_type=POSTGIS_GEOM_TYPES[geom_type], srid=SRID))
+    db.save()
+    return db.table(name)
+
+def drop_table(db, name):
+    db.execute('DROP TABLE IF EXISTS {}'.format(name))
+    db.save()
+
+@pytest.fixture(scope='module', params=GEOM_TYPES)
+def geom_type(request):
+    return request.param
+
+@pytest.fixture(scope='module')
+def dataset(geom_type, rows):
+    # The INSERT method doesn't quote dates, so leave them out.
+    return make_rows(geom_type, rows, dates=False)
+
+@pytest.fixture(scope='module')
+def write_table(postgis_db, geom_type):
+    name = 'datum_bench_write_{}'.format(geom_type)
+    yield create_table(postgis_db, name, geom_type)
+    drop_table(postgis_db, name)
+
+@pytest.fixture(scope='module')
+def read_table(postgis_db, geom_type, dataset):
+    name = 'datum_bench_read_{}'.format(geom_type)
+    table = create_table(postgis_db, name, geom_type)
+    table.write(dataset, method='copy')
+    yield table
+    drop_table(postgis_db, name)
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('method', WRITE_METHODS)
+def bench_write(measure, write_table, dataset, method, chunk_size):
+    measure(lambda: write_table.write(dataset, chunk_size=chunk_size, \
+        method=method), len(dataset), setup=write_table.delete)
+
+@pytest.mark.parametrize('row_type', ('dict', 'record'))
+def bench_read(measure, read_table, rows, row_type):
+    measure(lambda: read_table.read(row_type=row_type), rows)
+
+def bench_read_iter(measure, read_table, rows):
+    measure(lambda: sum(1 for _ in read_table.read_iter()), rows)
+
+def bench_read_lookup(measure, read_table, rows):
+    # Repeated lookups by key, as in a geocoding loop
+    lookups = min(rows, 1000)
+    measure(lambda: [read_table.read(where='id = %s', params=[i]) \
+        for i in range(1, lookups + 1)], lookups)
+
+def bench_get_many(measure, read_table, rows):
+    measure(lambda: read_table.get_many(range(1, rows + 1)), rows)
+
+def bench_read_reproject(measure, read_table, rows):
+    measure(lambda: read_table.read(to_srid=4326), rows)
@@ -0,0 +1,66 @@
+"""
+Synthetic point, line and polygon datasets for the benchmarks.
+
+Coordinates are laid out on a grid in state plane (EPSG:2272) so they can be
+reprojected. With `m_values=True` the WKT looks like what SDE.ST_AsText
+returns for linear-referenced data (`LINESTRING M (...)`), which Oracle reads
+have to scrub.
+"""
+from datetime import datetime, timedelta
+
+GEOM_TYPES = ('point', 'line', 'polygon')
+
+# PostGIS column types
+POSTGIS_GEOM_TYPES = {
+    'point':        'MultiPoint',
+    'line':         'MultiLineString',
+    'polygon':      'MultiPolygon',
+}
+
+SRID = 2272
+START_DATE = datetime(2020, 1, 1)
+
+def _coord(x, y, m_values):
+    if m_values:
+        return '{} {} 1.#QNAN000'.format(x, y)
+    return '{} {}'.format(x, y)
+
+def make_wkt(geom_type, i, vertices=20, m_values=False):
+    """Returns a WKT geometry for row `i`."""
+    x0 = 2690000 + (i % 1000) * 50
+    y0 = 230000 + (i // 1000) * 50
+    m = ' M' if m_values else ''
+    if geom_type == 'point':
+        return 'POINT{} ({})'.format(m, _coord(x0, y0, m_values))
+    elif geom_type == 'line':
+        coords = [_coord(x0 + j * 2, y0 + (j % 2) * 5, m_values) \
+            for j in range(vertices)]
+        return 'LINESTRING{} ({})'.format(m, ', '.join(coords))
+    elif geom_type == 'polygon':
+        coords = [_coord(x0 + (j % 2) * 40, y0 + (j // 2) * 10, m_values) \
+            for j in range(vertices)]
+        coords.append(coords[0])
+        return 'POLYGON{} (({}))'.format(m, ', '.join(coords))
+    raise ValueError('Unknown geometry type: {}'.format(geom_type))
+
+def make_rows(geom_type, n, vertices=20, dates=True):
+    """Returns `n` row dictionaries for writing."""
+    rows = []
+    for i in range(n):
+        row = {
+            'name':     "parcel {}'s name".format(i),
+            'value':    i * 1.5,
+            'shape':    make_wkt(geom_type, i, vertices=vertices),
+        }
+        if dates:
+            row['created'] = START_DATE + timedelta(seconds=i)
+        rows.append(row)
+    return rows
+
+def make_tuples(geom_type, n, vertices=20, m_values=False):
+    """Returns `n` rows as tuples (objectid, name, value, created, shape), as
+    an Oracle cursor would fetch them."""
+    return [(i + 1, "parcel {}'s name".format(i), i * 1.5, \
+        START_DATE + timedelta(seconds=i), \
+        make_wkt(geom_type, i, vertices=vertices, m_values=m_values)) \
+        for i in range(n)]
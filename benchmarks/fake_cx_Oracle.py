@@ -0,0 +1,118 @@
+"""
+A stand-in for the cx_Oracle module, so the Oracle adapter's own work
+(building statements, preparing values, scrubbing and reprojecting
+geometries) can be benchmarked without an Oracle client or server.
+
+Register rows with `add_table`. A SELECT from that table returns them as they
+are, so they should be in the order of the fields read, with geometries as
+SDE.ST_AsText would return them. Writes go through `executemany`, which
+counts the rows and drops them.
+"""
+import re
+
+__version__ = '8.3.0'
+
+class DatabaseError(Exception):
+    pass
+
+class InterfaceError(Exception):
+    pass
+
+# Types the adapter refers to
+DB_TYPE_CLOB = 'DB_TYPE_CLOB'
+DB_TYPE_BLOB = 'DB_TYPE_BLOB'
+DB_TYPE_LONG = 'DB_TYPE_LONG'
+DB_TYPE_LONG_RAW = 'DB_TYPE_LONG_RAW'
+CLOB = 'CLOB'
+BLOB = 'BLOB'
+LONG_STRING = 'LONG_STRING'
+LONG_BINARY = 'LONG_BINARY'
+SPOOL_ATTRVAL_WAIT = 1
+
+table_from_re = re.compile(r'\bFROM\s+([\w."]+)', re.I)
+
+_tables = {}
+
+def add_table(name, rows):
+    """Serve `rows` (a list of tuples) for SELECTs from `name`."""
+    _tables[name.lower()] = rows
+
+def clear():
+    _tables.clear()
+
+class Cursor(object):
+    def __init__(self):
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.outputtypehandler = None
+        self.description = None
+        self.rowcount = 0
+        self._stmt = None
+        self._rows = []
+        self._pos = 0
+
+    def var(self, type_, arraysize=None):
+        return None
+
+    def prepare(self, stmt):
+        self._stmt = stmt
+
+    def setinputsizes(self, *args, **kwargs):
+        pass
+
+    def execute(self, stmt, params=None):
+        stmt = stmt or self._stmt
+        self._rows = []
+        self._pos = 0
+        self.rowcount = 0
+        match = table_from_re.search(stmt)
+        if match:
+            name = match.group(1).replace('"', '').split('.')[-1]
+            self._rows = _tables.get(name.lower(), [])
+
+    def executemany(self, stmt, rows):
+        self.rowcount = len(rows)
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        batch = self._rows[self._pos:self._pos + size]
+        self._pos += size
+        return batch
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def fetchone(self):
+        batch = self.fetchmany(1)
+        return batch[0] if batch else None
+
+    def close(self):
+        pass
+
+class Connection(object):
+    def cursor(self):
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def connect(*args, **kwargs):
+    return Connection()
+
+class SessionPool(object):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def acquire(self):
+        return Connection()
+
+    def release(self, cxn):
+        pass
@@ -0,0 +1,75 @@
+"""
+Measure how geometry post-processing for Oracle reads scales with workers.
+
+    python benchmarks/geometry_workers.py --rows 200000 --workers 1,2,4,8
+
+Synthetic polygon WKT with m-values (as SDE.ST_AsText returns them) is run
+through `process_batches`, scrubbing m-values and reprojecting 2272 => 4326.
+No database is needed, but pyproj and shapely are. Without cx_Oracle, the
+fake module in this directory stands in for it.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Run from a checkout, datum isn't on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import cx_Oracle
+except ImportError:
+    # The Oracle adapter package imports cx_Oracle, though these helpers
+    # don't use it.
+    import fake_cx_Oracle
+    sys.modules['cx_Oracle'] = fake_cx_Oracle
+
+from datum.oracle_stgeom.util import process_batches
+
+def make_wkt(i, vertices):
+    x0 = 2690000 + (i % 1000) * 50
+    y0 = 230000 + (i // 1000) * 50
+    coords = ['{} {} 1.#QNAN000'.format(x0 + (j % 2) * 40, y0 + (j // 2) * 10) \
+        for j in range(vertices)]
+    coords.append(coords[0])
+    return 'POLYGON M (({}))'.format(', '.join(coords))
+
+def make_batches(rows, batch_size, vertices):
+    batch = []
+    for i in range(rows):
+        batch.append((i, make_wkt(i, vertices)))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def bench(rows, batch_size, vertices, workers):
+    """Returns rows/sec."""
+    start = time.time()
+    batches = make_batches(rows, batch_size, vertices)
+    count = 0
+    for batch in process_batches(batches, 1, from_srid=2272, to_srid=4326, \
+        workers=workers):
+        count += len(batch)
+    assert count == rows
+    return count / (time.time() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--vertices', type=int, default=20)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args()
+
+    print('{} rows, batch_size={}, {} vertices per polygon'.format(args.rows, \
+        args.batch_size, args.vertices))
+    base = bench(args.rows, args.batch_size, args.vertices, None)
+    print('{:<12} {:>12,.0f} rows/sec'.format('in-process', base))
+    for workers in [int(x) for x in args.workers.split(',')]:
+        rate = bench(args.rows, args.batch_size, args.vertices, workers)
+        print('{:<12} {:>12,.0f} rows/sec  ({:.1f}x)'.format(\
+            'workers={}'.format(workers), rate, rate / base))
+
+if __name__ == '__main__':
+    main()
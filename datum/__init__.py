@@ -1,8 +1,15 @@
+from .cache import MetadataCache, RowCache
+from .instrument import CounterSink, LoggingSink, Sink
 from .database import Database
+from .pipeline import copy
+from .sync import sync
+from .watermark import JsonWatermarkStore, SqliteWatermarkStore
 
-def connect(url):
+def connect(url, pool_size=None, metadata_cache=None, instruments=None):
     # TODO this should support things other than databases, like CSV sheets.
-    return Database(url)
+    return Database(url, pool_size=pool_size, metadata_cache=metadata_cache, \
+        instruments=instruments)
 
-def db(url):
-    return Database(url)
+def db(url, pool_size=None, metadata_cache=None, instruments=None):
+    return Database(url, pool_size=pool_size, metadata_cache=metadata_cache, \
+        instruments=instruments)
@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class MetadataCache(object):
+    """
+    Cache of table metadata (fields, geometry type, SRID, etc.), so tables
+    that are looked up over and over don't cost catalog queries each time.
+
+    Entries are keyed by database and table and expire after `ttl` seconds
+    (or never, if `ttl` is None). If `path` is given, the cache is loaded from
+    and saved to that JSON file so it survives between processes. The file is
+    written after each batch of values (`update`, e.g. from a prefetch) and
+    at exit; single values from lazy lookups are only written then.
+    """
+    def __init__(self, ttl=None, path=None):
+        self.ttl = ttl
+        self.path = os.path.expanduser(path) if path else None
+        self._lock = threading.Lock()
+        # {db_key: {table_key: {attr: [timestamp, value]}}}
+        self._entries = {}
+        # Whether there are changes that haven't been saved
+        self._dirty = False
+        if self.path:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            atexit.register(self.save)
+
+    def _expired(self, timestamp):
+        return self.ttl is not None and time.time() - timestamp > self.ttl
+
+    def get(self, db_key, table_key, attr):
+        """Get a cached value. Raises KeyError if it's missing or expired."""
+        with self._lock:
+            timestamp, value = self._entries[db_key][table_key][attr]
+        if self._expired(timestamp):
+            raise KeyError(attr)
+        return value
+
+    def set(self, db_key, table_key, attr, value):
+        """Store one value. It's saved with the next batch or at exit."""
+        self._store(db_key, {table_key: {attr: value}})
+
+    def update(self, db_key, tables):
+        """Store values for many tables at once, given a dictionary of
+        {table_key: {attr: value}}, and save."""
+        self._store(db_key, tables)
+        self.save()
+
+    def _store(self, db_key, tables):
+        now = time.time()
+        with self._lock:
+            db_entries = self._entries.setdefault(db_key, {})
+            for table_key, values in tables.items():
+                table_entries = db_entries.setdefault(table_key, {})
+                for attr, value in values.items():
+                    table_entries[attr] = [now, value]
+            self._dirty = True
+
+    def invalidate(self, db_key=None, table=None):
+        """
+        Drop cached entries: everything, everything for one database, or one
+        table. `table` may be given with or without its schema.
+        """
+        with self._lock:
+            if db_key is None:
+                self._entries = {}
+            elif table is None:
+                self._entries.pop(db_key, None)
+            else:
+                table = table.lower()
+                db_entries = self._entries.get(db_key, {})
+                for table_key in list(db_entries):
+                    if table_key == table or table_key.endswith('.' + table):
+                        del db_entries[table_key]
+            self._dirty = True
+        self.save()
+
+    def _prune(self):
+        """Drop expired entries. Call with the lock held."""
+        if self.ttl is None:
+            return
+        for db_key, db_entries in list(self._entries.items()):
+            for table_key, table_entries in list(db_entries.items()):
+                for attr, (timestamp, _) in list(table_entries.items()):
+                    if self._expired(timestamp):
+                        del table_entries[attr]
+                if not table_entries:
+                    del db_entries[table_key]
+            if not db_entries:
+                del self._entries[db_key]
+
+    def save(self):
+        """Write the cache to disk, if it has a path and has changed since
+        it was last saved. Expired entries are dropped first."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._prune()
+            data = json.dumps(self._entries, default=str)
+            self._dirty = False
+        # Write to a temp file first so readers never see a partial file.
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+class RowCache(object):
+    """
+    In-process LRU cache of rows looked up by key with `Table.get_many`, so
+    keys that come up again (e.g. the same parcel in a geocoding loop) don't
+    go back to the database. Holds up to `maxsize` rows across tables; the
+    least recently used are dropped first.
+
+    Rows aren't invalidated when the table changes, so `clear` the cache
+    after writing to a table it holds rows for. Keys that weren't found
+    aren't cached.
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # {(scope, key): row}
+        self._rows = OrderedDict()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, scope, keys):
+        """Returns the cached rows for `keys` as {key: row} and a list of the
+        keys that missed. `scope` identifies the table and read options."""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                cache_key = (scope, key)
+                row = self._rows.get(cache_key)
+                if row is None:
+                    missing.append(key)
+                    continue
+                self._rows.move_to_end(cache_key)
+                found[key] = row
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def set_many(self, scope, rows):
+        """Cache rows given as {key: row}."""
+        with self._lock:
+            for key, row in rows.items():
+                self._rows[(scope, key)] = row
+                self._rows.move_to_end((scope, key))
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
@@ -0,0 +1,72 @@
+import json
+
+def _import_pyarrow():
+    # pyarrow is only needed for columnar reads, so import it lazily.
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Columnar reads require pyarrow (pip install '
+            'datum[arrow])')
+    return pyarrow
+
+def geom_field_metadata(srid=None):
+    """Field metadata marking a binary column as GeoArrow WKB, so tools like
+    geopandas know what it holds."""
+    metadata = {'ARROW:extension:name': 'geoarrow.wkb'}
+    if srid:
+        crs = json.dumps({'crs': 'EPSG:{}'.format(srid)})
+        metadata['ARROW:extension:metadata'] = crs
+    return metadata
+
+def batches_to_arrow(batches, names, geom_field=None, srid=None):
+    """
+    Build a pyarrow Table from batches of row sequences (tuples or lists in
+    the same order as `names`).
+
+    Each batch is transposed into columns and turned into a record batch
+    straight away, so rows never exist as dictionaries and only one batch
+    of Python objects is alive at a time. `geom_field` should hold WKB; it
+    becomes a binary column tagged as GeoArrow WKB in `srid`.
+    """
+    pa = _import_pyarrow()
+    geom_i = names.index(geom_field) if geom_field in names else None
+
+    tables = []
+    for batch in batches:
+        columns = [list(x) for x in zip(*batch)]
+        arrays = []
+        for i, column in enumerate(columns):
+            if i == geom_i:
+                # Postgres hands back memoryviews
+                column = [bytes(x) if x is not None else None for x in column]
+                arrays.append(pa.array(column, type=pa.binary()))
+            else:
+                arrays.append(pa.array(column))
+        tables.append(pa.Table.from_arrays(arrays, names=names))
+
+    if not tables:
+        fields = [pa.field(x, pa.binary() if i == geom_i else pa.null()) \
+            for i, x in enumerate(names)]
+        tables.append(pa.schema(fields).empty_table())
+
+    # Batches can disagree on types, e.g. a column that's all null in one
+    # batch, integers in one and floats in the next, or decimals of
+    # different precision, so settle on a common schema that holds them all.
+    schema = pa.unify_schemas([x.schema for x in tables], \
+        promote_options='permissive')
+    if geom_i is not None:
+        geom = schema.field(geom_field)
+        schema = schema.set(geom_i, \
+            geom.with_metadata(geom_field_metadata(srid)))
+    return pa.concat_tables([x.cast(schema) for x in tables])
+
+def arrow_to_numpy(table):
+    """Returns a dictionary of column name => NumPy array."""
+    return {name: column.to_numpy() for name, column in \
+        zip(table.column_names, table.columns)}
+
+def column_max(table, name):
+    """Returns the largest value in a column, or None if it's empty."""
+    _import_pyarrow()
+    import pyarrow.compute
+    return pyarrow.compute.max(table.column(name)).as_py()
@@ -1,23 +1,31 @@
-from .util import parse_url
+from contextlib import contextmanager
+from .util import parse_url, adapter_module
+from .cache import MetadataCache
+from .instrument import Instruments, NULL_TIMER
 from .table import Table
-from .postgis import Database as PostgisDatabase
-from .oracle_stgeom import Database as OracleStgeomDatabase
 
 
-ADAPTER_CLASS_MAP = {
-    'postgis':          PostgisDatabase,
-    'oracle-stgeom':    OracleStgeomDatabase,
-}
-
 class Database(object):
     """Proxy class for database adapters."""
-    def __init__(self, url):
+    def __init__(self, url, pool_size=None, metadata_cache=None, \
+        instruments=None):
         self.url = url
+        # Maximum connections to pool, or None to not pool. One of them is
+        # shared by tables for the life of the database.
+        if pool_size is not None and pool_size < 2:
+            raise ValueError('pool_size must be at least 2')
+        self.pool_size = pool_size
+        # A MetadataCache, True for an in-memory one, or None to not cache.
+        if metadata_cache is True:
+            metadata_cache = MetadataCache()
+        self.metadata_cache = metadata_cache
+        # Instrumentation sinks (see `instrument.Sink`), or None
+        self.instruments = Instruments(instruments) if instruments else None
         adapter = self.adapter = parse_url(url)['scheme']
-        if adapter not in ADAPTER_CLASS_MAP:
-            raise ValueError('Unknown database type: {}'.format(adapter))
-        _ChildDatabase = ADAPTER_CLASS_MAP[adapter]
+        _ChildDatabase = adapter_module(adapter).Database
         self._child = _ChildDatabase(self)
+        # How many `transaction` blocks we're in
+        self._transaction_depth = 0
 
     def __str__(self):
         fmt = 'Database: {}'.format(self.adapter)
@@ -37,15 +45,96 @@ class Database(object):
     def user(self):
         return self._child.user
 
-    @property
-    def _c(self):
-        return self._child._c
-
     def execute(self, stmt):
         return self._child.execute(stmt)
 
+    def new_connection(self):
+        """Open a new driver connection to the same database."""
+        return self._child.new_connection()
+
+    def connection(self):
+        """
+        Context manager that checks out a driver connection, from the pool
+        if the database was opened with `pool_size`:
+
+            with db.connection() as cxn:
+                ...
+        """
+        return self._child.connection()
+
+    def cursor(self):
+        """
+        Context manager for a cursor on its own connection, for work that
+        shouldn't share the connection used by tables (e.g. in another
+        thread). Commits when the block succeeds:
+
+            with db.cursor() as c:
+                c.execute(stmt)
+        """
+        return self._child.cursor()
+
+    def shared_cursor(self, **kwargs):
+        """
+        Context manager for a cursor on the connection shared by tables, for
+        one operation. Table methods each get their own; changes are
+        committed with `save` (or at the end of a `transaction` block).
+        """
+        return self._child.shared_cursor(**kwargs)
+
+    def timer(self, table, operation, phase, rows=None):
+        """
+        Context manager that reports how long a phase of a table operation
+        took to the instrumentation sinks. Does nothing if there aren't any:
+
+            with db.timer('parcels', 'write', 'prepare', rows=len(chunk)):
+                ...
+        """
+        if not self.instruments:
+            return NULL_TIMER
+        return self.instruments.timer(table, operation, phase, rows=rows)
+
     def save(self):
-        self._child.save()
+        """Commit, unless inside a `transaction` block (which commits when it
+        ends)."""
+        if self._transaction_depth:
+            return
+        with self.timer(None, 'db', 'commit'):
+            self._child.save()
+
+    @property
+    def in_transaction(self):
+        return self._transaction_depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager that runs everything in the block as one transaction
+        on the shared connection. The commits tables normally make after each
+        chunk of a write, a delete or an index change are held back until the
+        block ends, and everything is rolled back if it raises:
+
+            with db.transaction():
+                table.delete()
+                table.write(rows)
+
+        Blocks can be nested; only the outermost one commits. Oracle commits
+        DDL (e.g. TRUNCATE) implicitly, so it can't be rolled back there.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            if self._transaction_depth == 1:
+                self._child.rollback()
+            raise
+        else:
+            if self._transaction_depth == 1:
+                self._child.save()
+        finally:
+            self._transaction_depth -= 1
+
+    def rollback(self):
+        self._child.rollback()
 
     def close(self):
         self._child.close()
@@ -54,6 +143,49 @@ class Database(object):
         """Get a reference to a database table"""
         return Table(self, name)
 
+    """METADATA CACHE"""
+
+    @property
+    def _cache_key(self):
+        """Identifies the database in the metadata cache, without the
+        password."""
+        p = parse_url(self.url)
+        return '{scheme}://{user}@{host}/{db_name}'.format(**p)
+
+    def cached_metadata(self, table_key, attr, getter):
+        """
+        Get a metadata attribute for a table from the metadata cache, calling
+        `getter` to compute (and cache) it on a miss.
+        """
+        cache = self.metadata_cache
+        if cache is not None:
+            try:
+                return cache.get(self._cache_key, table_key, attr)
+            except KeyError:
+                pass
+        with self.timer(table_key, 'metadata', attr):
+            value = getter()
+        if cache is not None:
+            cache.set(self._cache_key, table_key, attr, value)
+        return value
+
+    def invalidate_metadata(self, table=None):
+        """Drop cached metadata for one table, or all tables if none is
+        given."""
+        if self.metadata_cache:
+            self.metadata_cache.invalidate(self._cache_key, table=table)
+
+    def prefetch_metadata(self, schema=None):
+        """
+        Load metadata for all tables (optionally just those in `schema`) into
+        the metadata cache with bulk catalog queries, creating an in-memory
+        cache if there isn't one.
+        """
+        if self.metadata_cache is None:
+            self.metadata_cache = MetadataCache()
+        tables = self._child.prefetch_metadata(schema=schema)
+        self.metadata_cache.update(self._cache_key, tables)
+
     @property
     def tables(self):
         """Get a list of all table names."""
@@ -66,9 +198,11 @@ class Database(object):
 
     def create_table(self, table, fields):
         self._child.create_table(table, fields)
+        self.invalidate_metadata(table)
 
     def drop_table(self, table):
         self._child.drop_table(table)
+        self.invalidate_metadata(table)
 
     def create_view(self, view, select_stmt):
         self._child.create_view(view, select_stmt)
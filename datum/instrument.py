@@ -0,0 +1,259 @@
+import logging
+import threading
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+class Sink(object):
+    """
+    Base class for instrumentation sinks, which are passed to `datum.connect`
+    (`instruments=[...]`) to find out where the time goes:
+
+        statement: a SQL statement run on any of datum's cursors, with how
+                   long the server took and the cursor's row count
+        phase:     a step of a table operation (e.g. the 'fetch' or 'commit'
+                   phase of a 'read' or 'write'), with its duration and,
+                   where known, a row count
+
+    Subclasses override either or both.
+    """
+    def statement(self, sql, seconds, rows=None):
+        pass
+
+    def phase(self, table, operation, phase, seconds, rows=None):
+        pass
+
+class LoggingSink(Sink):
+    """Logs each event, by default to the `datum.instrument` logger at DEBUG
+    level. Statements are cut to `max_sql` characters."""
+    def __init__(self, logger=logger, level=logging.DEBUG, max_sql=200):
+        self.logger = logger
+        self.level = level
+        self.max_sql = max_sql
+
+    def statement(self, sql, seconds, rows=None):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        sql = ' '.join(str(sql).split())
+        if self.max_sql and len(sql) > self.max_sql:
+            sql = sql[:self.max_sql] + '...'
+        self.logger.log(self.level, '{:.4f}s {} rows: {}'.format(seconds, \
+            rows, sql))
+
+    def phase(self, table, operation, phase, seconds, rows=None):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        msg = '{:.4f}s {}.{}'.format(seconds, operation, phase)
+        if table:
+            msg += ' on {}'.format(table)
+        if rows is not None:
+            msg += ' ({} rows)'.format(rows)
+        self.logger.log(self.level, msg)
+
+class CounterSink(Sink):
+    """
+    Keeps running totals of calls, seconds and rows, per statement type (the
+    first word of the SQL) and per table phase. Scrape them with `prometheus`
+    or flush them to StatsD with `statsd_lines`; `snapshot` returns the raw
+    numbers.
+    """
+    def __init__(self, prefix='datum'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # {(metric, labels): [calls, seconds, rows]}
+        self._totals = {}
+
+    def _add(self, metric, labels, seconds, rows):
+        key = (metric, labels)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = [0, 0.0, 0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += rows or 0
+
+    def statement(self, sql, seconds, rows=None):
+        words = str(sql).split(None, 1)
+        verb = words[0].upper() if words else ''
+        # A negative row count means the driver doesn't know
+        rows = rows if rows and rows > 0 else 0
+        self._add('statement', (('verb', verb),), seconds, rows)
+
+    def phase(self, table, operation, phase, seconds, rows=None):
+        labels = (('table', table or ''), ('operation', operation), \
+            ('phase', phase))
+        self._add('phase', labels, seconds, rows)
+
+    def snapshot(self):
+        """Returns {(metric, labels): {'calls', 'seconds', 'rows'}}, where
+        labels is a tuple of (name, value) pairs."""
+        with self._lock:
+            return {key: dict(zip(('calls', 'seconds', 'rows'), totals)) \
+                for key, totals in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals = {}
+
+    def prometheus(self):
+        """Returns the totals in the Prometheus text exposition format."""
+        lines = []
+        totals = sorted(self.snapshot().items())
+        for metric in ('statement', 'phase'):
+            for stat, help_ in (('calls', 'Calls'), ('seconds', 'Seconds'), \
+                ('rows', 'Rows')):
+                name = '{}_{}_{}_total'.format(self.prefix, metric, stat)
+                lines.append('# HELP {} {} by {}.'.format(name, help_, metric))
+                lines.append('# TYPE {} counter'.format(name))
+                for (key_metric, labels), values in totals:
+                    if key_metric != metric:
+                        continue
+                    labels_joined = ','.join('{}="{}"'.format(k, \
+                        v.replace('\\', '\\\\').replace('"', '\\"')) \
+                        for k, v in labels)
+                    lines.append('{}{{{}}} {}'.format(name, labels_joined, \
+                        values[stat]))
+        return '\n'.join(lines) + '\n'
+
+    def statsd_lines(self, reset=True):
+        """
+        Returns StatsD lines for the totals since the last flush: a counter
+        for calls and rows and a timing (in ms) for the time spent. Send them
+        with any StatsD client or a UDP socket.
+        """
+        snapshot = self.snapshot()
+        if reset:
+            self.reset()
+        lines = []
+        for (metric, labels), values in sorted(snapshot.items()):
+            name = '.'.join([self.prefix, metric] + [v.replace('.', '_') \
+                for _, v in labels if v])
+            lines.append('{}.calls:{}|c'.format(name, values['calls']))
+            lines.append('{}.rows:{}|c'.format(name, values['rows']))
+            lines.append('{}.time:{:.3f}|ms'.format(name, \
+                values['seconds'] * 1000))
+        return lines
+
+class Timer(object):
+    """Times a phase in a `with` block. Set `rows` inside the block if the
+    count isn't known up front."""
+    __slots__ = ('_instruments', 'table', 'operation', 'phase', 'rows', \
+        '_start')
+
+    def __init__(self, instruments, table, operation, phase, rows=None):
+        self._instruments = instruments
+        self.table = table
+        self.operation = operation
+        self.phase = phase
+        self.rows = rows
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._instruments.phase(self.table, self.operation, self.phase, \
+            perf_counter() - self._start, self.rows)
+        return False
+
+class _NullTimer(object):
+    """Stands in for `Timer` when instrumentation is off."""
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class Instruments(object):
+    """Sends events to a list of sinks. A sink that raises is logged and
+    skipped, so instrumentation can't break a load."""
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def statement(self, sql, seconds, rows=None):
+        for sink in self.sinks:
+            try:
+                sink.statement(sql, seconds, rows)
+            except Exception:
+                logger.exception('Instrumentation sink failed')
+
+    def phase(self, table, operation, phase, seconds, rows=None):
+        for sink in self.sinks:
+            try:
+                sink.phase(table, operation, phase, seconds, rows)
+            except Exception:
+                logger.exception('Instrumentation sink failed')
+
+    def timer(self, table, operation, phase, rows=None):
+        return Timer(self, table, operation, phase, rows=rows)
+
+def instrument_cursor(cursor, instruments):
+    """Wrap `cursor` in an `InstrumentedCursor` if there are any sinks."""
+    if not instruments:
+        return cursor
+    return InstrumentedCursor(cursor, instruments)
+
+class InstrumentedCursor(object):
+    """
+    Wraps a driver cursor so each `execute`, `executemany` and `copy_expert`
+    is reported as a statement. Everything else is passed through to the
+    cursor.
+    """
+    def __init__(self, cursor, instruments):
+        self._cursor = cursor
+        self._instruments = instruments
+        self._prepared = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name in ('_cursor', '_instruments', '_prepared'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def prepare(self, stmt, *args, **kwargs):
+        self._prepared = stmt
+        return self._cursor.prepare(stmt, *args, **kwargs)
+
+    def execute(self, stmt, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self._cursor.execute(stmt, *args, **kwargs)
+        finally:
+            self._report(stmt, perf_counter() - start)
+
+    def executemany(self, stmt, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self._cursor.executemany(stmt, *args, **kwargs)
+        finally:
+            self._report(stmt, perf_counter() - start)
+
+    def copy_expert(self, stmt, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self._cursor.copy_expert(stmt, *args, **kwargs)
+        finally:
+            self._report(stmt, perf_counter() - start)
+
+    def _report(self, stmt, seconds):
+        # cx_Oracle runs the prepared statement when it's given None
+        if stmt is None:
+            stmt = self._prepared or ''
+        if isinstance(stmt, bytes):
+            stmt = stmt.decode(errors='replace')
+        self._instruments.statement(stmt, seconds, \
+            getattr(self._cursor, 'rowcount', None))
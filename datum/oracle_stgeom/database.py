@@ -1,8 +1,17 @@
 import os
+from collections import OrderedDict
+from contextlib import contextmanager
 import cx_Oracle
 from datum.util import parse_url
+from datum.instrument import instrument_cursor
+from datum.oracle_stgeom.table import CATALOG_TYPE_MAP, \
+    geom_type_from_eflags
 # from .table import Table
 
+# Statements cached per connection by cx_Oracle, so reads repeated with
+# different bind variables aren't parsed again.
+STMT_CACHE_SIZE = 100
+
 class Database(object):
     """Oracle database connection."""
 
@@ -22,23 +31,103 @@ class Database(object):
         # Prevent cx_Oracle from converting everything to ASCII.
         os.environ['NLS_LANG'] = '.UTF8'
 
-        self.cxn = cx_Oracle.connect(dsn)
-        self._c = self.cxn.cursor()
+        self._dsn = dsn
 
-    def execute(self, stmt):
-        self._c.execute(stmt)
+        # With a pool, the connection shared by tables is checked out for the
+        # life of the database and others come and go with `connection()`,
+        # waiting for one to be released if they're all checked out.
+        self._pool = None
+        if parent.pool_size:
+            pool_dsn = self.host
+            if self.name: pool_dsn += '/' + self.name
+            self._pool = cx_Oracle.SessionPool(self.user, self.password, \
+                pool_dsn, 1, parent.pool_size, 1, threaded=True, \
+                getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT)
+            self.cxn = self._pool.acquire()
+        else:
+            # Threaded, since tables' cursors may be used from other threads
+            self.cxn = cx_Oracle.connect(dsn, threaded=True)
+        self.cxn.stmtcachesize = STMT_CACHE_SIZE
+
+    def new_connection(self):
+        """
+        Open a new connection to the database, separate from the one shared
+        by tables (e.g. for reading in another thread).
+        """
+        cxn = cx_Oracle.connect(self._dsn, threaded=True)
+        cxn.stmtcachesize = STMT_CACHE_SIZE
+        return cxn
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a `with` block. It comes
+        from the session pool if there is one; otherwise a new connection is
+        opened and closed afterwards. Uncommitted changes are rolled back
+        when the connection is handed back.
+        """
+        if self._pool:
+            cxn = self._pool.acquire()
+            cxn.stmtcachesize = STMT_CACHE_SIZE
+        else:
+            cxn = self.new_connection()
         try:
-            rows = self._c.fetchall()
-        # Return rowcount for non-SELECT operations
-        except cx_Oracle.InterfaceError:
-            return self._c.rowcount
+            yield cxn
+        finally:
+            if self._pool:
+                cxn.rollback()
+                self._pool.release(cxn)
+            else:
+                cxn.close()
+
+    @contextmanager
+    def cursor(self):
+        """
+        Get a cursor on its own connection for one operation. Changes are
+        committed if the block succeeds and rolled back if it doesn't.
+        """
+        with self.connection() as cxn:
+            c = instrument_cursor(cxn.cursor(), \
+                self.parent.instruments)
+            try:
+                yield c
+                cxn.commit()
+            finally:
+                c.close()
+
+    @contextmanager
+    def shared_cursor(self):
+        """
+        Get a cursor on the shared connection for one operation, closed when
+        the block ends. Unlike `cursor`, nothing is committed: changes are
+        part of the shared connection's transaction (see `save`).
+        """
+        c = instrument_cursor(self.cxn.cursor(), \
+            self.parent.instruments)
+        try:
+            yield c
+        finally:
+            c.close()
+
+    def execute(self, stmt):
+        with self.shared_cursor() as c:
+            c.execute(stmt)
+            try:
+                rows = c.fetchall()
+            # Return rowcount for non-SELECT operations
+            except cx_Oracle.InterfaceError:
+                return c.rowcount
         # Unpack single values
         if len(rows) > 0 and len(rows[0]) == 1:
             rows = [x[0] for x in rows]
         return rows
 
     def close(self):
-        self.cxn.close()
+        if self._pool:
+            self._pool.release(self.cxn)
+            self._pool.close()
+        else:
+            self.cxn.close()
 
     # def table(self, name):
     #     # Check for a schema
@@ -60,17 +149,86 @@ class Database(object):
         """.format(self._user_p)
         return sorted(self.execute(stmt))
 
+    def prefetch_metadata(self, schema=None):
+        '''
+        Get metadata for all tables owned by `schema` (or the user) with one
+        query against ALL_TAB_COLS and one against SDE.LAYERS. Returns
+        {table key: {attribute: value}} for the metadata cache. Tables with
+        field types we can't map are skipped so they fail when they're
+        actually used, as they would without a cache.
+        '''
+        owner = (schema or self.user).upper()
+        stmt = """
+            SELECT LOWER(TABLE_NAME), LOWER(COLUMN_NAME), DATA_TYPE, NULLABLE
+            FROM ALL_TAB_COLS
+            WHERE OWNER = '{}' AND HIDDEN_COLUMN = 'NO'
+            ORDER BY TABLE_NAME, COLUMN_ID
+        """.format(owner)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
+            columns = c.fetchall()
+        tables = OrderedDict()
+        objectid_fields = {}
+        skip = set()
+        for table, column, data_type, nullable in columns:
+            key = '{}.{}'.format(owner, table).lower()
+            if data_type.startswith('TIMESTAMP'):
+                type_ = 'date'
+            elif data_type in CATALOG_TYPE_MAP:
+                type_ = CATALOG_TYPE_MAP[data_type]
+            else:
+                skip.add(key)
+                continue
+            values = tables.setdefault(key, {'metadata': OrderedDict()})
+            values['metadata'][column] = {'type': type_}
+            if nullable == 'N' and column.startswith('objectid'):
+                objectid_fields.setdefault(key, []).append(column)
+
+        for key, values in tables.items():
+            # Same rule as Table._get_objectid_field
+            fields = objectid_fields.get(key, [])
+            values['objectid_field'] = fields[0] if len(fields) == 1 else None
+
+        stmt = """
+            SELECT
+                LOWER(l.table_name),
+                bitand(l.eflags, 2),
+                bitand(l.eflags, 4) + bitand(l.eflags, 8),
+                bitand(l.eflags, 16),
+                bitand(l.eflags, 262144),
+                s.auth_srid
+            FROM sde.layers l
+            LEFT JOIN sde.spatial_references s
+            ON l.srid = s.srid
+            WHERE l.owner = '{}'
+        """.format(owner)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
+            layers = c.fetchall()
+        for table, point, line, polygon, multipart, srid in layers:
+            key = '{}.{}'.format(owner, table).lower()
+            if key not in tables:
+                continue
+            try:
+                geom_type = geom_type_from_eflags(point, line, polygon, \
+                    multipart)
+            except ValueError:
+                continue
+            tables[key]['geom_type'] = geom_type
+            tables[key]['srid'] = srid
+        return OrderedDict((k, v) for k, v in tables.items() if k not in skip)
+
     ############################################################################
     # READ
     ############################################################################
 
-    def _dictify(self, geom_field=None):
+    def _dictify(self, c, geom_field=None):
         '''
         Turns query results into a list of dictionaries. This reads from the 
         cursor because calling fetchall() on rows breaks the geometry LOB.
         '''
-        fields = [x[0].lower() for x in self._c.description]
-        rows = self._c
+        fields = [x[0].lower() for x in c.description]
+        rows = c
 
         # Non-spatial
         if geom_field is None:
@@ -121,14 +279,15 @@ class Database(object):
         elif limit:
             stmt += " WHERE ROWNUM <= {}".format(limit)
 
-        try:
-            self._c.execute(stmt)
-        except cx_Oracle.DatabaseError as e:
-            print('Error executing statement:\n{}'.format(stmt))
-            raise
+        with self.shared_cursor() as c:
+            try:
+                c.execute(stmt)
+            except cx_Oracle.DatabaseError as e:
+                print('Error executing statement:\n{}'.format(stmt))
+                raise
 
-        if dictify:
-            rows = self._dictify(geom_field=geom_field)
+            if dictify:
+                rows = self._dictify(c, geom_field=geom_field)
         return rows
 
 
@@ -143,6 +302,13 @@ class Database(object):
         self.cxn.commit()
 
 
+    def rollback(self):
+        '''
+        Roll back uncommitted database changes
+        '''
+        self.cxn.rollback()
+
+
     def bulk_insert(self, table, rows, geom_field=None, from_srid=None, \
         multi_geom=True, chunk_size=None):
         '''
@@ -189,7 +355,8 @@ class Database(object):
             vals_joined = ['({})'.format(', '.join(vals)) for vals in val_rows]
             rows_joined = ', '.join(vals_joined)
             cur_stmt += rows_joined
-            self._c.execute(cur_stmt)
+            with self.shared_cursor() as c:
+                c.execute(cur_stmt)
             self.save()
 
 
@@ -198,5 +365,6 @@ class Database(object):
         Drops all rows from a table
         '''
         stmt = 'DELETE FROM {}'.format(table)
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
\ No newline at end of file
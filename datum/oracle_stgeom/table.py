@@ -1,10 +1,20 @@
 import re
 from datetime import datetime
 from collections import OrderedDict
-from datum.util import dbl_quote
-from datum.oracle_stgeom.util import WktTransformer
+from contextlib import contextmanager
+from itertools import chain
+from datum.util import dbl_quote, chunked, iter_threaded, key_ranges, \
+    CommitInterval, check_geom_format, to_wkb, run_each, index_rebuild_error
+from datum.columnar import batches_to_arrow
+from datum.records import check_row_type, field_value, row_factory
+from datum.instrument import instrument_cursor
+from datum.oracle_stgeom.util import has_m_value, remove_m_value, \
+    process_batches, ewkb_to_wkb, make_rowid
 import cx_Oracle
 
+# The highest row number a ROWID range needs to cover a whole block
+MAX_ROWS_PER_BLOCK = 32767
+
 # These are strings because one type (OBJECTVAR) isn't importable from
 # the cx_Oracle module.
 FIELD_TYPE_MAP = {
@@ -30,8 +40,35 @@ FIELD_TYPE_MAP = {
     'DB_TYPE_VARCHAR': 'text',
     'DB_TYPE_NVARCHAR': 'text'
 }
-m_geom_type_re = re.compile(' M(?= )')
-m_value_re = re.compile(' 1.#QNAN000')
+# Field types by ALL_TAB_COLS.DATA_TYPE, for reading metadata from the catalog
+# in bulk. Types that don't map cleanly to the above are left out.
+CATALOG_TYPE_MAP = {
+    'NUMBER':       'num',
+    'FLOAT':        'num',
+    'INTEGER':      'num',
+    'VARCHAR2':     'text',
+    'NVARCHAR2':    'text',
+    'CHAR':         'text',
+    'NCHAR':        'text',
+    'DATE':         'date',
+    'NCLOB':        'nclob',
+    'ST_GEOMETRY':  'geom',
+}
+
+def geom_type_from_eflags(point, line, polygon, multipart):
+    """Decode the bitmasked EFLAGS values of SDE.LAYERS into an OGC geometry
+    type (see `Table._get_geom_type`)."""
+    if point > 0:
+        geom_type = 'POINT'
+    elif line > 0:
+        geom_type = 'LINESTRING'
+    elif polygon > 0:
+        geom_type = 'POLYGON'
+    else:
+        raise ValueError('Unknown geometry type')
+    if multipart > 0:
+        geom_type = 'MULTI' + geom_type
+    return geom_type
 
 class Table(object):
     """Oracle ST_Geometry table."""
@@ -40,13 +77,8 @@ class Table(object):
         self.db = parent.db
         self.name = parent.name
         self.schema = parent.schema
-        self._c = self.db._c
-        self._c.outputtypehandler = self.output_type_handler
-        self.metadata = self._get_metadata()
-        self.geom_field = self._get_geom_field()
-        self.geom_type = self._get_geom_type() if self.geom_field else None
-        self.srid = self._get_srid() if self.geom_field else None
-        self.objectid_field = self._get_objectid_field()
+        # Metadata attributes, loaded on first access (see `_lazy`)
+        self._lazy_values = {}
 
 
     def output_type_handler(self, cursor, name, default_type, size, precision, scale):
@@ -73,15 +105,53 @@ class Table(object):
             return '.'.join([dbl_quote(x) for x in comps])
         return self.name
 
+    @property
+    def _cache_key(self):
+        """Identifies the table in the metadata cache."""
+        return '{}.{}'.format(self._owner, self.name).lower()
+
     @property
     def _owner(self):
         """Return the owner name for querying system tables. This is either
         the schema or the DB user."""
         return self.schema or self.db.user
 
-    def _exec(self, stmt):
-        self._c.execute(stmt)
-        return self._c.fetchall()
+    def _exec(self, stmt, params=None):
+        with self.db.shared_cursor() as c:
+            c.execute(stmt, params)
+            return c.fetchall()
+
+    def _lazy(self, attr, getter):
+        """Get a metadata attribute, computing it (or getting it from the
+        database's metadata cache) the first time it's asked for."""
+        if attr not in self._lazy_values:
+            self._lazy_values[attr] = self.db.cached_metadata(self._cache_key, \
+                attr, getter)
+        return self._lazy_values[attr]
+
+    @property
+    def metadata(self):
+        return self._lazy('metadata', self._get_metadata)
+
+    @property
+    def geom_field(self):
+        return self._get_geom_field()
+
+    @property
+    def geom_type(self):
+        if not self.geom_field:
+            return None
+        return self._lazy('geom_type', self._get_geom_type)
+
+    @property
+    def srid(self):
+        if not self.geom_field:
+            return None
+        return self._lazy('srid', self._get_srid)
+
+    @property
+    def objectid_field(self):
+        return self._lazy('objectid_field', self._get_objectid_field)
 
     @property
     def fields(self):
@@ -95,11 +165,10 @@ class Table(object):
             on l.srid = s.srid
             where l.owner = '{}' and l.table_name = '{}'
         '''.format(self._owner.upper(), self.name.upper())
-        self._c.execute(stmt)
-        row = self._c.fetchone()
+        rows = self._exec(stmt)
         try:
-            srid = row[0]
-        except TypeError:
+            srid = rows[0][0]
+        except IndexError:
             srid = None
         return srid
 
@@ -134,22 +203,13 @@ class Table(object):
             point, line, polygon, multipart = self._exec(stmt)[0]
         except IndexError:
             return None
-        if point > 0:
-            geom_type = 'POINT'
-        elif line > 0:
-            geom_type = 'LINESTRING'
-        elif polygon > 0:
-            geom_type = 'POLYGON'
-        else:
-            raise ValueError('Unknown geometry type')
-        if multipart > 0:
-            geom_type = 'MULTI' + geom_type
-        return geom_type
+        return geom_type_from_eflags(point, line, polygon, multipart)
 
     def _get_metadata(self):
         stmt = "SELECT * FROM {} WHERE 1 = 0".format(self._name_p)
-        self._c.execute(stmt)
-        desc = self._c.description
+        with self.db.shared_cursor() as c:
+            c.execute(stmt)
+            desc = c.description
         fields = OrderedDict()
         for field in desc:
             name = field[0].lower()
@@ -199,120 +259,356 @@ class Table(object):
     def non_geom_fields(self):
         return [x for x in self.fields if x != self.geom_field]
 
-    def _get_wkt_selector(self, to_srid=None):
+    def _get_wkt_selector(self, to_srid=None, geom_format='wkt'):
         assert self.geom_field
         geom_field_t = geom_field = self.geom_field
         # SDE.ST_Transform doesn't work when the datums differ. Unfortunately,
         # 4326 <=> 2272 is one of those. Using Shapely + PyProj for now.
-        return "SDE.ST_AsText({}) AS {}"\
-            .format(geom_field_t, geom_field)
+        # Everything but WKT is read as WKB and converted afterwards (see
+        # `util.process_wkbs`).
+        func = 'SDE.ST_AsText' if geom_format == 'wkt' else 'SDE.ST_AsBinary'
+        return "{}({}) AS {}".format(func, geom_field_t, geom_field)
 
     def _has_m_value(self, wkt):
         """Checks a WKT geometry for an m-value (used in linear referencing.)"""
-        return (m_geom_type_re.search(wkt) is not None)
+        return has_m_value(wkt)
 
     def _remove_m_value(self, wkt):
-        """
-        Removes the m-value from a WKT geometry.
-        TODO: do this more elegantly/generically.
-        """
-        # Take the `M` out
-        wkt = m_geom_type_re.sub('', wkt)
-        # Take the  1.#QNAN000 out.
-        wkt = m_value_re.sub('', wkt)
-        return wkt
+        """Removes the m-value from a WKT geometry."""
+        return remove_m_value(wkt)
 
     def count(self):
         stmt = "SELECT COUNT(*) FROM {}".format(self._name_p)
-        self._c.execute(stmt)
-        return self._c.fetchone()[0]
+        return self._exec(stmt)[0][0]
+
+    def _cursor(self, arraysize=None, prefetchrows=None, \
+        output_type_handler=True, cxn=None):
+        """Open a new cursor for a read, so it doesn't clobber (or get
+        clobbered by) statements on the shared cursor. Uses the shared
+        connection unless `cxn` is given."""
+        cxn = cxn or self.db._child.cxn
+        c = instrument_cursor(cxn.cursor(), self.db.instruments)
+        if output_type_handler:
+            c.outputtypehandler = self.output_type_handler
+        if arraysize:
+            c.arraysize = arraysize
+        # Only available in cx_Oracle 8+
+        if prefetchrows:
+            c.prefetchrows = prefetchrows
+        return c
+
+    def _fetch_batches(self, stmt, params=None, geom_field_i=None, \
+        arraysize=None, prefetchrows=None, cxn=None):
+        """Execute a statement with bind variables `params` and yield lists
+        of up to `arraysize` rows."""
+        c = self._cursor(arraysize=arraysize, prefetchrows=prefetchrows, \
+            cxn=cxn)
+        try:
+            with self.db.timer(self.name, 'read', 'query'):
+                c.execute(stmt, params)
+            unpack_geom = False
+            try:
+                with self.db.timer(self.name, 'read', 'fetch') as timer:
+                    batch = c.fetchmany()
+                    timer.rows = len(batch)
+            except cx_Oracle.DatabaseError:
+                # Read without outputtypehandler and unpack geometry LOBs by
+                # hand.
+                c.close()
+                c = None
+                c = self._cursor(arraysize=arraysize, \
+                    prefetchrows=prefetchrows, output_type_handler=False, \
+                    cxn=cxn)
+                c.execute(stmt, params)
+                batch = c.fetchmany()
+                unpack_geom = geom_field_i is not None
+            while batch:
+                if unpack_geom:
+                    for i, source_row in enumerate(batch):
+                        row = list(source_row)
+                        geom = row[geom_field_i]
+                        row[geom_field_i] = geom.read() if geom else None
+                        batch[i] = row
+                yield batch
+                with self.db.timer(self.name, 'read', 'fetch') as timer:
+                    batch = c.fetchmany()
+                    timer.rows = len(batch)
+        finally:
+            if c is not None:
+                c.close()
 
     def read(self, fields=None, aliases=None, geom_field=None, to_srid=None,
-        return_geom=True, limit=None, where=None, sort=None, arraysize=None):
+        return_geom=True, limit=None, where=None, sort=None, arraysize=None,
+        prefetchrows=None, workers=None, parallel=None, stream=False,
+        since=None, watermark_field=None, geom_format='wkt', row_type='dict',
+        params=None):
+        rows = self.read_iter(fields=fields, aliases=aliases, \
+            geom_field=geom_field, to_srid=to_srid, return_geom=return_geom, \
+            limit=limit, where=where, sort=sort, arraysize=arraysize, \
+            prefetchrows=prefetchrows, workers=workers, parallel=parallel, \
+            since=since, watermark_field=watermark_field, \
+            geom_format=geom_format, row_type=row_type, params=params)
+        if stream:
+            return rows
+        return list(rows)
+
+    def _bind(self, params, name, value):
+        """
+        Add a value to a read's bind variables, returning its placeholder
+        and the new bind variables. A sequence is bound by position, so the
+        value goes on the end.
+        """
+        if isinstance(params, dict):
+            return ':' + name, dict(params, **{name: value})
+        return ':' + name, list(params) + [value]
+
+    def _read_stmt(self, fields=None, aliases=None, geom_field=None, \
+        to_srid=None, return_geom=True, limit=None, where=None, since=None, \
+        watermark_field=None, geom_format='wkt', params=None):
+        """
+        Form the SELECT statement for a read. Returns the statement, its bind
+        variables, the (lowercased, aliased) output field names and the index
+        of the geometry field, if any.
+
+        If `since` is given, only rows with a `watermark_field` greater than
+        it are selected. `since` and `limit` are always bound, along with any
+        `params` for placeholders in `where` (`:name`), so changing them
+        doesn't make Oracle parse the statement again.
+        """
         # If no geom_field was specified and we're supposed to return geom,
         # get it from the object.
         geom_field = geom_field or (self.geom_field if return_geom else None)
 
         # Select
-        fields = fields or self.non_geom_fields
+        fields = list(fields or self.non_geom_fields)
         select_items = list(fields)
         if return_geom:
             if geom_field:
-                select_items.append(self._get_wkt_selector(to_srid=to_srid))
+                select_items.append(self._get_wkt_selector(to_srid=to_srid, \
+                    geom_format=geom_format))
                 fields.append(geom_field)
         joined = ', '.join(select_items)
         stmt = "SELECT {} FROM {}".format(joined, self._name_p)
 
         # Other params
+        params = params or {}
+        if since is not None:
+            if not watermark_field:
+                raise ValueError('Reading since a watermark requires a watermark_field')
+            since_bind, params = self._bind(params, 'datum_since', since)
+            since_where = '{} > {}'.format(watermark_field, since_bind)
+            where = '({}) AND {}'.format(where, since_where) if where \
+                else since_where
+        if limit:
+            limit_bind, params = self._bind(params, 'datum_limit', limit)
+            limit_where = 'ROWNUM <= {}'.format(limit_bind)
+            where = '({}) AND {}'.format(where, limit_where) if where \
+                else limit_where
         if where:
             stmt += " WHERE {}".format(where)
-            if limit:
-                stmt += " AND ROWNUM <= {}".format(limit)
-        elif limit:
-            stmt += " WHERE ROWNUM <= {}".format(limit)
 
-        if arraysize: 
-            old = self._c.arraysize
-            self._c.arraysize = arraysize
-            print('arraysize changed from {} to {}'.format(old, self._c.arraysize))
-                        
-        self._c.execute(stmt)
+        geom_field_i = None
+        if return_geom and geom_field:
+            geom_field_i = fields.index(geom_field)
 
         # Handle aliases
         if aliases:
           fields = [aliases[x] if x in aliases else x for x in fields]
 
         fields_lower = [x.lower() for x in fields]
-        if geom_field:
-            geom_field_i = fields.index(geom_field)
-        try:
-            rows = self._c.fetchall()
-        except cx_Oracle.DatabaseError as e:
-            # Read without outputtypehandler:
-            self._c = self.db._child.cxn.cursor()
-            self._c.execute(stmt)
-            rows = []
-            # Unpack geometry.
-            for i, source_row in enumerate(self._c):
-                row = list(source_row)
-                if geom_field:
-                    geom = row[geom_field_i]
-                    row[geom_field_i] = geom.read() if geom else None
-                rows.append(row)
-
-
-        # If there were no rows returned, don't move on to next step where
-        # we try to get a row.
-        if len(rows) == 0:
-            return rows
+        return stmt, params or None, fields_lower, geom_field_i
+
+    def read_iter(self, fields=None, aliases=None, geom_field=None, \
+        to_srid=None, return_geom=True, limit=None, where=None, sort=None, \
+        arraysize=None, prefetchrows=None, workers=None, parallel=None, \
+        since=None, watermark_field=None, geom_format='wkt', row_type='dict',
+        params=None):
+        """
+        Lazily read rows, fetching `arraysize` rows per round trip.
+
+        M-value scrubbing, making rows and reprojection all happen in a
+        single pass over each batch, so memory is bounded by the batch size
+        rather than the size of the table. Reprojection is done a batch at a
+        time with `WktTransformer.transform_many`.
+
+        Geometry post-processing is CPU-bound; pass `workers` to spread it
+        over that many processes (see `util.process_batches`).
 
-        # Check if we need to scrub m-values.
+        With `parallel=N`, the table is split into N ranges of the object ID
+        field (or, if there isn't one, ROWID ranges over the table's extents;
+        see `_rowid_partitions`) which are read concurrently, each on its own
+        connection. Rows come back in no particular order.
+
+        Geometries come back as `geom_format`: 'wkt' (the default), 'wkb',
+        'ewkb' or 'shapely'. They're read with SDE.ST_AsBinary for all but
+        WKT, and WKB that doesn't need reprojecting is passed through as-is.
+
+        Rows are dicts unless `row_type` is 'tuple', 'namedtuple' or 'record'
+        (see `records.Record`), which take much less memory.
+
+        `where` can have bind variables (`:name`) with their values in
+        `params`, a dict or a sequence in the order they appear. Statements
+        are cached per connection (see `STMT_CACHE_SIZE`), so repeating a read
+        with different values skips the parse.
+        """
+        check_geom_format(geom_format)
+        check_row_type(row_type)
+        stmt_kwargs = dict(fields=fields, aliases=aliases, \
+            geom_field=geom_field, to_srid=to_srid, return_geom=return_geom, \
+            limit=limit, since=since, watermark_field=watermark_field, \
+            geom_format=geom_format)
+        stmt, bind_params, fields_lower, geom_field_i = self._read_stmt(\
+            where=where, params=params, **stmt_kwargs)
+        fetch_kwargs = dict(geom_field_i=geom_field_i, arraysize=arraysize, \
+            prefetchrows=prefetchrows)
+
+        if parallel:
+            if limit:
+                raise ValueError('Parallel reads cannot be limited')
+            batches = self._fetch_parallel(parallel, where, params, \
+                stmt_kwargs, fetch_kwargs)
+        else:
+            batches = self._fetch_batches(stmt, params=bind_params, \
+                **fetch_kwargs)
+
+        # Scrub m-values and transform if we need to.
         # WKT will look like `POLYGON M (...)`
-        if geom_field:
-            if self._has_m_value(rows[0][geom_field_i]):
-                for i, row in enumerate(rows):
-                    row = list(row)
-                    geom = self._remove_m_value(row[geom_field_i])
-                    row[geom_field_i] = geom
-                    rows[i] = row
-
-            # TODO if the WKT geom is single but the geom_type for the table
-            # is multi, we may want to convert it. Seems to be working for now
-            # though.
-
-        # Dictify.
-        rows = [dict(zip(fields_lower, row)) for row in rows]
-
-        # Transform if we need to
-        if to_srid and to_srid != self.srid:
-            geom_field_l = geom_field.lower()
-            tsf = WktTransformer(self.srid, to_srid)
-            for row in rows:
-                geom = row[geom_field_l]
-                geom_t = tsf.transform(geom)
-                row[geom_field_l] = geom_t
+        # TODO if the WKT geom is single but the geom_type for the table is
+        # multi, we may want to convert it. Seems to be working for now though.
+        if geom_field_i is not None:
+            batches = process_batches(batches, geom_field_i, \
+                from_srid=self.srid, to_srid=to_srid, workers=workers, \
+                geom_format=geom_format, timer=self._geometry_timer)
+
+        return self._make_rows(batches, fields_lower, row_type)
+
+    def read_arrow(self, fields=None, aliases=None, geom_field=None, \
+        to_srid=None, return_geom=True, limit=None, where=None, sort=None, \
+        arraysize=None, prefetchrows=None, workers=None, since=None, \
+        watermark_field=None, params=None):
+        """
+        Read rows into a pyarrow Table, with the geometry as a WKB column
+        (see `columnar.batches_to_arrow`). Each batch fetched from the cursor
+        goes straight into columns without being made into dictionaries.
+        """
+        stmt, params, fields_lower, geom_field_i = self._read_stmt(\
+            fields=fields, aliases=aliases, geom_field=geom_field, \
+            to_srid=to_srid, return_geom=return_geom, limit=limit, \
+            where=where, since=since, watermark_field=watermark_field, \
+            geom_format='wkb', params=params)
+        batches = self._fetch_batches(stmt, params=params, \
+            geom_field_i=geom_field_i, arraysize=arraysize, \
+            prefetchrows=prefetchrows)
+        geom_name = None
+        if geom_field_i is not None:
+            batches = process_batches(batches, geom_field_i, \
+                from_srid=self.srid, to_srid=to_srid, workers=workers, \
+                geom_format='wkb', timer=self._geometry_timer)
+            geom_name = fields_lower[geom_field_i]
+        return batches_to_arrow(batches, fields_lower, geom_field=geom_name, \
+            srid=to_srid or self.srid)
+
+    def _geometry_timer(self, rows):
+        return self.db.timer(self.name, 'read', 'geometry', rows=rows)
+
+    def _make_rows(self, batches, fields, row_type='dict'):
+        make_row = row_factory(row_type, fields)
+        for batch in batches:
+            for row in batch:
+                yield make_row(row)
+
+    def _fetch_parallel(self, parallel, where, params, stmt_kwargs, \
+        fetch_kwargs):
+        """Fetch batches from partitions of the table concurrently."""
+        if self.objectid_field:
+            stmt = "SELECT MIN({0}), MAX({0}) FROM {1}".format(\
+                self.objectid_field, self._name_p)
+            if where:
+                stmt += " WHERE {}".format(where)
+            lo, hi = self._exec(stmt, params)[0]
+            if lo is None:
+                return iter([])
+            partitions = ['{0} >= {1} AND {0} < {2}'.format(\
+                self.objectid_field, start, end) \
+                for start, end in key_ranges(lo, hi, parallel)]
+        else:
+            partitions = self._rowid_partitions(parallel)
+            if partitions is None:
+                # Last resort: every worker scans the whole table for its
+                # hash bucket, so this only helps if fetching is the
+                # bottleneck.
+                partitions = ['MOD(ORA_HASH(ROWID), {}) = {}'.format(\
+                    parallel, i) for i in range(parallel)]
+
+        def partition_reader(partition):
+            if where:
+                partition = '({}) AND {}'.format(where, partition)
+            stmt, bind_params, _, _ = self._read_stmt(where=partition, \
+                params=params, **stmt_kwargs)
+            def read_partition():
+                with self.db.connection() as cxn:
+                    for batch in self._fetch_batches(stmt, \
+                        params=bind_params, cxn=cxn, **fetch_kwargs):
+                        yield batch
+            return read_partition
+
+        readers = [partition_reader(x) for x in partitions]
+        return iter_threaded(readers, queue_size=2 * len(readers))
+
+    def _rowid_partitions(self, parallel):
+        """
+        Split the table's blocks into `parallel` groups of about the same
+        size, and return a WHERE clause of ROWID ranges for each, so every
+        worker reads its own blocks. Returns None if the extents can't be
+        listed (that needs access to DBA_EXTENTS) or the table has none.
+        """
+        stmt = '''
+            select o.data_object_id, e.relative_fno, e.block_id, e.blocks
+            from dba_extents e
+            join all_objects o on
+                o.owner = e.owner and
+                o.object_name = e.segment_name and
+                nvl(o.subobject_name, '-') = nvl(e.partition_name, '-') and
+                o.object_type like 'TABLE%'
+            where
+                e.owner = :owner and
+                e.segment_name = :name
+            order by o.data_object_id, e.relative_fno, e.block_id
+        '''
+        try:
+            extents = self._exec(stmt, {'owner': self._owner.upper(), \
+                'name': self.name.upper()})
+        except cx_Oracle.DatabaseError:
+            return None
+        total = sum(x[3] for x in extents)
+        if not total:
+            return None
 
-        return rows
+        # Deal out the blocks in order, cutting extents where one group ends
+        # and the next begins. A group's blocks are consecutive, so they make
+        # one range per data object (partitions each have their own).
+        groups = [[] for _ in range(parallel)]
+        done = 0
+        for data_object_id, relative_fno, block_id, blocks in extents:
+            start = 0
+            while start < blocks:
+                i = (done + start) * parallel // total
+                next_group = -(-(i + 1) * total // parallel)
+                end = min(blocks, next_group - done)
+                lo = make_rowid(data_object_id, relative_fno, \
+                    block_id + start, 0)
+                hi = make_rowid(data_object_id, relative_fno, \
+                    block_id + end - 1, MAX_ROWS_PER_BLOCK)
+                group = groups[i]
+                if group and group[-1][0] == data_object_id:
+                    group[-1][2] = hi
+                else:
+                    group.append([data_object_id, lo, hi])
+                start = end
+            done += blocks
+        return ['({})'.format(' OR '.join(\
+            "ROWID BETWEEN CHARTOROWID('{}') AND CHARTOROWID('{}')".format(\
+            lo, hi) for _, lo, hi in group)) for group in groups if group]
 
     def _prepare_geom(self, geom, srid, transform_srid=None, multi_geom=True):
         """Prepares WKT geometry by projecting and casting as necessary."""
@@ -339,6 +635,15 @@ class Table(object):
 
         return geom
 
+    def _prepare_wkb(self, geom, geom_format):
+        """Get plain WKB for a binary or shapely geometry. SDE doesn't read
+        EWKB, so that's converted."""
+        if geom is None:
+            return None
+        if geom_format == 'ewkb':
+            return ewkb_to_wkb(geom)
+        return to_wkb(geom)
+
     def _prepare_val(self, val, type_):
         """Prepare a value for entry into the DB."""
         if val is None:
@@ -362,24 +667,83 @@ class Table(object):
             raise TypeError("Unhandled type: '{}'".format(type_))
         return val
 
-    def write(self, rows, from_srid=None, chunk_size=None):
+    def _merge_stmt(self, fields, placeholders, key=None, objectid=None):
+        """
+        Returns a MERGE statement that updates rows matching on `key` (a field
+        name or list of them; the object ID field by default) and inserts the
+        rest. `objectid` is an (object ID field, incrementor) pair to add to
+        inserted rows.
+        """
+        key = key or self.objectid_field
+        if not key:
+            raise ValueError('Upserting requires a key field')
+        keys = [key] if isinstance(key, str) else list(key)
+        missing = [x for x in keys if x not in fields]
+        if missing:
+            raise ValueError('Upsert key field(s) missing from rows: {}'\
+                .format(', '.join(missing)))
+
+        source = ', '.join('{} AS {}'.format(placeholder, field) \
+            for field, placeholder in zip(fields, placeholders))
+        on = ' AND '.join('t.{0} = s.{0}'.format(x) for x in keys)
+        insert_fields = list(fields)
+        insert_vals = ['s.' + x for x in fields]
+        if objectid:
+            insert_fields.append(objectid[0])
+            insert_vals.append(objectid[1])
+
+        stmt = "MERGE INTO {} t USING (SELECT {} FROM dual) s ON ({})"\
+            .format(self.name, source, on)
+        updates = ['t.{0} = s.{0}'.format(x) for x in fields if x not in keys]
+        if updates:
+            stmt += " WHEN MATCHED THEN UPDATE SET {}".format(', '.join(updates))
+        stmt += " WHEN NOT MATCHED THEN INSERT ({}) VALUES ({})"\
+            .format(', '.join(insert_fields), ', '.join(insert_vals))
+        return stmt
+
+    def write(self, rows, from_srid=None, chunk_size=None, mode='append', \
+        key=None, commit_every=None, geom_format='wkt'):
         """
         Inserts dictionary row objects in the the database.
-        Args: list of row dicts, table name, ordered field names
+        Args: iterable of row dicts, table name, ordered field names
+
+        Rows are consumed `chunk_size` at a time, so they can come from a
+        generator (e.g. `read_iter`) instead of a list. The geometry type is
+        sniffed from the first chunk.
 
         Originally this formed one big INSERT statement with a chunks of x
         rows, but it's considerably faster to use the cx_Oracle `executemany`
         function. See methods 1 and 2 below.
 
+        `mode` is one of:
+            append: insert all rows (the default)
+            upsert: update rows that match on `key` and insert the rest, with
+                    a MERGE statement (see `_merge_stmt`)
+
+        Each chunk is committed as it's written, unless `commit_every` is a
+        number of rows to write between commits or 'end' to commit once.
+
+        Geometries can be given as `geom_format` 'wkt' (the default), 'wkb',
+        'ewkb' or 'shapely'. The binary formats are bound as BLOBs and built
+        with SDE.ST_GeomFromWKB; WKB goes through untouched. They aren't cast
+        to MULTI types.
+
         TODO: it might be faster to call NEXTVAL on the DB sequence for OBJECTID
         rather than use the SDE helper function.
         """
-        if len(rows) == 0:
+        if mode not in ('append', 'upsert'):
+            raise ValueError("Unknown write mode: '{}'".format(mode))
+        check_geom_format(geom_format)
+
+        # Rows can be any iterable, so work through them a chunk at a time.
+        chunks = chunked(rows, chunk_size)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
             return
 
         # Get fields from the row because some fields from self.fields may be
         # optional, such as an autoincrementing PK.
-        fields = rows[0].keys()
+        fields = first_chunk[0].keys()
         # Sort so LOB fields are at the end
         fields = sorted(fields, key=lambda x: 'lob' in self.metadata[x]['type'])
 
@@ -389,10 +753,11 @@ class Table(object):
 
         # Do we need to cast the geometry to a MULTI type? (Assuming all rows
         # have the same geom type.)
-        if geom_field:
+        multi_geom = False
+        if geom_field and geom_format == 'wkt':
             # Look for an insert row with a geom to get the geom type.
             row_geom_type = None
-            for row in rows:
+            for row in first_chunk:
                 geom = row[geom_field]
                 if geom:
                     try:
@@ -404,7 +769,7 @@ class Table(object):
 
             # Check for a geom_type first, in case the table is empty.
             if geom_type and geom_type.startswith('MULTI') and \
-                not row_geom_type.startswith('MULTI'):
+                row_geom_type and not row_geom_type.startswith('MULTI'):
                 multi_geom = True
             else:
                 multi_geom = False
@@ -425,7 +790,10 @@ class Table(object):
         # Create placeholders for prepared statement
         for field in fields:
             type_ = type_map[field]
-            if type_ == 'geom':
+            if type_ == 'geom' and geom_format != 'wkt':
+                placeholders.append('SDE.ST_GeomFromWKB(:{}, {})'\
+                    .format(field, self.srid))
+            elif type_ == 'geom':
                 placeholders.append('SDE.ST_Geometry(:{}, {})'\
                     .format(field, self.srid))
             elif type_ == 'date':
@@ -435,56 +803,65 @@ class Table(object):
                 placeholders.append(':' + field)
 
         # Inject the object ID field if it's missing from the supplied rows
-        stmt_fields = list(fields)
+        objectid = None
         if self.objectid_field and self.objectid_field not in fields:
-            stmt_fields.append(self.objectid_field)
             incrementor = "SDE.GDB_UTIL.NEXT_ROWID('{}', '{}')"\
                 .format(self._owner, self.name)
-            placeholders.append(incrementor)
+            objectid = (self.objectid_field, incrementor)
         # Prepare statement
-        placeholders_joined = ', '.join(placeholders)
-        stmt_fields_joined = ', '.join(stmt_fields)
-        stmt = "INSERT INTO {} ({}) VALUES ({})".format(self.name, \
-            stmt_fields_joined, placeholders_joined)
-        self._c.prepare(stmt)
-
-        # END OF METHODS
-
-        len_rows = len(rows)
-        if chunk_size is None or len_rows < chunk_size:
-            iterations = 1
+        if mode == 'upsert':
+            stmt = self._merge_stmt(fields, placeholders, key=key, \
+                objectid=objectid)
         else:
-            iterations = int(len_rows / chunk_size)
-            iterations += (len_rows % chunk_size > 0)  # round up
-
-        # Make list of value lists
-        for i in range(0, iterations):
-            val_rows = []
-            if chunk_size:
-                start = i * chunk_size
-                end = min(len_rows, start + chunk_size)
-            else:
-                start = i
-                end = len_rows
-
-            for row in rows[start:end]:
-                val_row = []
-                for field, type_ in type_map_items:
-                    if type_ == 'geom':
-                        geom = row[geom_field]
-                        val = self._prepare_geom(geom, srid, \
-                            multi_geom=multi_geom)
-                        val_row.append(val)
-                    else:
-                        val = self._prepare_val(row[field], type_)
-                        # TODO: NCLOBS should be inserted via array vars
-                        # if type_ == 'nclob':
-                        val_row.append(val)
-                val_rows.append(val_row)
-
-            # METHOD 2
-            self._c.executemany(None, val_rows)
-            self._save()
+            stmt_fields = list(fields)
+            if objectid:
+                stmt_fields.append(objectid[0])
+                placeholders.append(objectid[1])
+            placeholders_joined = ', '.join(placeholders)
+            stmt_fields_joined = ', '.join(stmt_fields)
+            stmt = "INSERT INTO {} ({}) VALUES ({})".format(self.name, \
+                stmt_fields_joined, placeholders_joined)
+        commits = CommitInterval(self._save, commit_every)
+        with self.db.shared_cursor() as c:
+            c.prepare(stmt)
+            if geom_format != 'wkt':
+                # WKB can be longer than a RAW bind allows
+                c.setinputsizes(*[cx_Oracle.BLOB if type_ == 'geom' \
+                        else None for _, type_ in type_map_items])
+
+            # END OF METHODS
+
+            # Make list of value lists
+            for chunk in chain([first_chunk], chunks):
+                val_rows = []
+
+                with self.db.timer(self.name, 'write', 'prepare', \
+                    rows=len(chunk)):
+                    for row in chunk:
+                        val_row = []
+                        for field, type_ in type_map_items:
+                            if type_ == 'geom' and geom_format != 'wkt':
+                                val_row.append(self._prepare_wkb(\
+                                    row[geom_field], geom_format))
+                            elif type_ == 'geom':
+                                geom = row[geom_field]
+                                val = self._prepare_geom(geom, srid, \
+                                    multi_geom=multi_geom)
+                                val_row.append(val)
+                            else:
+                                val = self._prepare_val(row[field], type_)
+                                # TODO: NCLOBS should be inserted via array
+                                # vars
+                                # if type_ == 'nclob':
+                                val_row.append(val)
+                        val_rows.append(val_row)
+
+                # METHOD 2
+                with self.db.timer(self.name, 'write', 'execute', \
+                    rows=len(chunk)):
+                    c.executemany(None, val_rows)
+                commits.chunk_written(len(chunk))
+        commits.finish()
 
     def delete(self, cascade=False):
         """Delete all rows."""
@@ -492,9 +869,141 @@ class Table(object):
         # RESTART IDENTITY resets sequence generators.
         stmt = "TRUNCATE TABLE {}".format(name)
         stmt += ' CASCADE' if cascade else ''
-        self._c.execute(stmt)
+        with self.db.shared_cursor() as c:
+            c.execute(stmt)
         self.db.save()
 
+    def delete_many(self, keys, key_field=None):
+        """
+        Delete rows whose `key_field` (the object ID field by default) is in
+        `keys`. Oracle allows at most 1000 items in an IN list, so keys are
+        deleted in chunks of that size.
+        """
+        key = key_field or self.objectid_field
+        if not key:
+            raise ValueError('Deleting by key requires a key field')
+        count = 0
+        with self.db.shared_cursor() as c:
+            for chunk in chunked(keys, 1000):
+                placeholders = ', '.join(':{}'.format(i + 1) \
+                    for i in range(len(chunk)))
+                stmt = "DELETE FROM {} WHERE {} IN ({})".format(\
+                    self._name_p, key, placeholders)
+                c.execute(stmt, chunk)
+                count += c.rowcount
+        self._save()
+        return count
+
+    def get_many(self, keys, key_field=None, fields=None, **kwargs):
+        """
+        Read rows whose `key_field` (the object ID field by default) is in
+        `keys` and return them as {key: row}. Keys are bound in IN lists of
+        at most 1000, Oracle's limit. Other arguments are passed to `read`.
+        """
+        key_field = key_field or self.objectid_field
+        if not key_field:
+            raise ValueError('Reading by key requires a key field')
+        if fields and key_field.lower() not in [x.lower() for x in fields]:
+            fields = list(fields) + [key_field]
+        name = (kwargs.get('aliases') or {}).get(key_field, key_field).lower()
+        rows = {}
+        for chunk in chunked(keys, 1000):
+            # Pad short chunks to a power of two with the last key, so only a
+            # handful of distinct statements go through the statement cache.
+            size = min(1 << (len(chunk) - 1).bit_length(), 1000)
+            chunk += [chunk[-1]] * (size - len(chunk))
+            placeholders = ', '.join(':{}'.format(i + 1) \
+                for i in range(size))
+            where = '{} IN ({})'.format(key_field, placeholders)
+            for row in self.read(fields=fields, where=where, params=chunk, \
+                **kwargs):
+                rows[field_value(row, name)] = row
+        return rows
+
+    def _get_index_ddl(self):
+        """
+        Returns (index name, DDL) for each index on the table that can be
+        dropped, i.e. leaving out LOB indexes and indexes that enforce
+        constraints.
+        """
+        stmt = '''
+            select i.index_name, dbms_metadata.get_ddl('INDEX', i.index_name, i.owner)
+            from all_indexes i
+            where
+                i.table_owner = '{}' and
+                i.table_name = '{}' and
+                i.index_type <> 'LOB' and
+                not exists (
+                    select 1 from all_constraints c
+                    where c.owner = i.table_owner and c.index_name = i.index_name
+                )
+        '''.format(self._owner.upper(), self.name.upper())
+        indexes = []
+        for name, ddl in self._exec(stmt):
+            # DDL comes back as a CLOB
+            indexes.append((name, ddl.read() if hasattr(ddl, 'read') else ddl))
+        return indexes
+
+    @contextmanager
+    def bulk_load(self, workers=None):
+        """
+        Context manager that drops the table's indexes (including the
+        ST_Geometry spatial index) for the duration of a bulk load, then
+        rebuilds them and gathers optimizer statistics:
+
+            with table.bulk_load(workers=4):
+                table.write(rows)
+
+        Indexes that enforce constraints are left alone. Indexes are rebuilt
+        `workers` at a time on separate connections, and even if the load
+        fails. One that fails to build doesn't stop the rest; a RuntimeError
+        at the end lists the DDL that didn't apply.
+        """
+        table = '{}.{}'.format(self._owner.upper(), self.name.upper())
+        indexes = self._get_index_ddl()
+        dropped = []
+        try:
+            with self.db.shared_cursor() as c:
+                for name, ddl in indexes:
+                    c.execute('DROP INDEX {}.{}'.format(\
+                        dbl_quote(self._owner.upper()), dbl_quote(name)))
+                    dropped.append(ddl)
+        except Exception:
+            # DDL commits as it goes, so put back what was dropped
+            failures = self._build_indexes(dropped, workers=workers)
+            if failures:
+                raise index_rebuild_error(table, failures)
+            raise
+
+        try:
+            yield self
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            failures = self._build_indexes(dropped, workers=workers)
+            with self.db.shared_cursor() as c:
+                c.callproc('DBMS_STATS.GATHER_TABLE_STATS', \
+                    [self._owner.upper(), self.name.upper()])
+            self._save()
+            if failures:
+                raise index_rebuild_error(table, failures)
+
+    def _build_indexes(self, ddls, workers=None):
+        """
+        Run CREATE INDEX statements, `workers` at a time. Failures don't stop
+        the rest. Returns (statement, error) for each one that failed.
+        """
+        if workers and workers > 1:
+            def build(ddl):
+                with self.db.cursor() as c:
+                    c.execute(ddl)
+        else:
+            def build(ddl):
+                with self.db.shared_cursor() as c:
+                    c.execute(ddl)
+        return run_each(build, ddls, workers=workers)
+
     def _save(self):
         """Convenience method for committing changes."""
         self.db.save()
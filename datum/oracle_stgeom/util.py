@@ -1,19 +1,176 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import re
 import pyproj
-from shapely.wkt import loads as shp_loads, dumps as shp_dumps
-from shapely.ops import transform as shp_transform
+import shapely
+from datum.instrument import NULL_TIMER
+
+m_geom_type_re = re.compile(' M(?= )')
+m_value_re = re.compile(' 1.#QNAN000')
+
+def has_m_value(wkt):
+    """Checks a WKT geometry for an m-value (used in linear referencing.)"""
+    return (m_geom_type_re.search(wkt) is not None)
+
+def remove_m_value(wkt):
+    """
+    Removes the m-value from a WKT geometry.
+    TODO: do this more elegantly/generically.
+    """
+    # Take the `M` out
+    wkt = m_geom_type_re.sub('', wkt)
+    # Take the  1.#QNAN000 out.
+    wkt = m_value_re.sub('', wkt)
+    return wkt
+
+ROWID_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz' \
+    '0123456789+/'
+
+def make_rowid(data_object_id, relative_fno, block, row):
+    """Builds an extended ROWID string, like DBMS_ROWID.ROWID_CREATE."""
+    def encode(n, width):
+        return ''.join(ROWID_CHARS[(n >> 6 * i) & 63] \
+            for i in reversed(range(width)))
+    return encode(data_object_id, 6) + encode(relative_fno, 3) + \
+        encode(block, 6) + encode(row, 3)
+
+@lru_cache(maxsize=None)
+def get_transformer(from_srid, to_srid):
+    """Returns a cached pyproj Transformer between two EPSG codes."""
+    # always_xy keeps coordinates in x, y (lon, lat) order regardless of how
+    # the CRS defines its axes. Units (e.g. US feet for 2272) come from the
+    # CRS definition.
+    return pyproj.Transformer.from_crs('EPSG:{}'.format(from_srid), \
+        'EPSG:{}'.format(to_srid), always_xy=True)
 
 class WktTransformer(object):
     def __init__(self, from_srid, to_srid):
-        # TODO if a projected coordinate system is involved that does not use
-        # feet, you need to pass in `preserve_units=True` into pyproj.Proj
-        # so that it doesn't assume we're working with meters.
-        self.project = partial(
-            pyproj.transform,
-            pyproj.Proj('+init=EPSG:{}'.format(from_srid)),
-            pyproj.Proj('+init=EPSG:{}'.format(to_srid))
-        )
+        self.transformer = get_transformer(from_srid, to_srid)
+
+    def _transform_coords(self, coords):
+        """Transform an (n, 2) or (n, 3) coordinate array. Z values are
+        passed through as-is."""
+        x, y = self.transformer.transform(coords[:, 0], coords[:, 1])
+        coords_t = coords.copy()
+        coords_t[:, 0] = x
+        coords_t[:, 1] = y
+        return coords_t
+
+    def transform_many(self, from_wkts):
+        """
+        Transform a sequence of WKT geometries in one go. The geometries are
+        parsed, reprojected and dumped as arrays, so the per-geometry work
+        happens in shapely and pyproj rather than in Python. Empty values are
+        returned as None.
+        """
+        from_wkts = [x or None for x in from_wkts]
+        geoms = shapely.from_wkt(from_wkts)
+        geoms_t = shapely.transform(geoms, self._transform_coords, \
+            include_z=None)
+        return shapely.to_wkt(geoms_t, rounding_precision=-1, trim=False)\
+            .tolist()
 
     def transform(self, from_wkt):
-        from_shp = shp_loads(from_wkt)
-        shp_t = shp_transform(self.project, from_shp)
-        return shp_dumps(shp_t)
+        return self.transform_many([from_wkt])[0]
+
+def process_wkts(wkts, remove_m=False, from_srid=None, to_srid=None):
+    """Scrub m-values from and reproject a list of WKT geometries. This is a
+    module-level function so it can be sent to worker processes."""
+    if remove_m:
+        wkts = [remove_m_value(x) if x else x for x in wkts]
+    if to_srid and to_srid != from_srid:
+        wkts = WktTransformer(from_srid, to_srid).transform_many(wkts)
+    return wkts
+
+def ewkb_to_wkb(ewkb):
+    """Strip the SRID (and other extensions) from an EWKB geometry."""
+    return shapely.to_wkb(shapely.from_wkb(bytes(ewkb)))
+
+def process_wkbs(wkbs, geom_format='wkb', from_srid=None, to_srid=None):
+    """
+    Reproject a list of WKB geometries and return them as `geom_format`
+    ('wkb', 'ewkb' or 'shapely'). WKB that doesn't need reprojecting is
+    passed through untouched. Like `process_wkts`, this can be sent to worker
+    processes.
+    """
+    transform = to_srid and to_srid != from_srid
+    if geom_format == 'wkb' and not transform:
+        return [bytes(x) if x else None for x in wkbs]
+    geoms = shapely.from_wkb([bytes(x) if x else None for x in wkbs])
+    if transform:
+        transformer = WktTransformer(from_srid, to_srid)
+        geoms = shapely.transform(geoms, transformer._transform_coords, \
+            include_z=None)
+    if geom_format == 'shapely':
+        return geoms.tolist()
+    elif geom_format == 'ewkb':
+        geoms = shapely.set_srid(geoms, to_srid or from_srid or 0)
+        return shapely.to_wkb(geoms, include_srid=True).tolist()
+    return shapely.to_wkb(geoms).tolist()
+
+def process_batches(batches, geom_field_i, from_srid=None, to_srid=None, \
+    workers=None, geom_format='wkt', timer=None):
+    """
+    Post-process the geometry in batches of rows, yielding each batch as a
+    list of lists. WKT is handled by `process_wkts` and binary geometries by
+    `process_wkbs`.
+
+    Whether to scrub m-values is decided on the first geometry seen. If
+    `workers` is set, batches are fanned out to that many processes, with up
+    to two batches per worker in flight; batches still come out in order.
+
+    `timer`, given a batch's row count, returns a context manager to time
+    the processing with (see `Database.timer`). With workers, it times how
+    long results are waited on.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+    timer = timer or (lambda rows: NULL_TIMER)
+    pending = deque()
+    remove_m = None
+
+    def finish(batch, geoms):
+        for row, geom in zip(batch, geoms):
+            row[geom_field_i] = geom
+        return batch
+
+    if geom_format == 'wkt':
+        process = process_wkts
+        process_kwargs = dict(from_srid=from_srid, to_srid=to_srid)
+    else:
+        process = process_wkbs
+        process_kwargs = dict(geom_format=geom_format, from_srid=from_srid, \
+            to_srid=to_srid)
+        # M-values don't need scrubbing from WKB
+        remove_m = False
+
+    try:
+        for batch in batches:
+            batch = [list(row) for row in batch]
+            geoms = [row[geom_field_i] for row in batch]
+            if remove_m is None:
+                first_geom = next((x for x in geoms if x), None)
+                if first_geom:
+                    remove_m = has_m_value(first_geom)
+            if geom_format == 'wkt':
+                process_kwargs['remove_m'] = remove_m
+            if executor is None:
+                with timer(len(batch)):
+                    geoms = process(geoms, **process_kwargs)
+                yield finish(batch, geoms)
+                continue
+            future = executor.submit(process, geoms, **process_kwargs)
+            pending.append((batch, future))
+            if len(pending) >= workers * 2:
+                batch, future = pending.popleft()
+                with timer(len(batch)):
+                    geoms = future.result()
+                yield finish(batch, geoms)
+        while pending:
+            batch, future = pending.popleft()
+            with timer(len(batch)):
+                geoms = future.result()
+            yield finish(batch, geoms)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,60 @@
+import logging
+import time
+from datum.util import chunked, iter_threaded
+
+logger = logging.getLogger(__name__)
+
+def copy(src, dst, fields=None, aliases=None, where=None, to_srid=None, \
+    chunk_size=10000, queue_size=4, geom_format=None, read_kwargs=None, \
+    write_kwargs=None):
+    """
+    Copy rows from one table to another.
+
+    A reader thread pulls `chunk_size` rows at a time from `src` and hands
+    them to the writer (the calling thread) through a queue holding at most
+    `queue_size` chunks, so reading and writing overlap while memory stays
+    bounded. `fields`, `aliases`, `where` and `to_srid` are passed through to
+    `src.read_iter`; any other options can be passed with `read_kwargs` and
+    `write_kwargs`. `geom_format` (e.g. 'wkb') is used for both sides, so
+    geometries can pass between databases without going through WKT.
+
+    Both tables are used from different threads, so if they live in the same
+    Oracle database they should come from separate `datum.connect` calls.
+
+    Returns a dictionary with the number of rows copied, the elapsed time and
+    the rate in rows/sec.
+    """
+    read_kwargs = dict(read_kwargs or {})
+    write_kwargs = dict(write_kwargs or {})
+    if to_srid:
+        write_kwargs.setdefault('from_srid', to_srid)
+    if geom_format:
+        read_kwargs.setdefault('geom_format', geom_format)
+        write_kwargs.setdefault('geom_format', geom_format)
+
+    rows = src.read_iter(fields=fields, aliases=aliases, where=where, \
+        to_srid=to_srid, **read_kwargs)
+    chunks = iter_threaded([lambda: chunked(rows, chunk_size)], \
+        queue_size=queue_size)
+
+    count = 0
+    start = time.time()
+    try:
+        for chunk in chunks:
+            dst.write(chunk, **write_kwargs)
+            count += len(chunk)
+            elapsed = time.time() - start
+            logger.info('Copied {} rows to {} ({:.0f} rows/sec)'.format(count, \
+                dst, count / elapsed if elapsed else 0))
+    finally:
+        chunks.close()
+
+    elapsed = time.time() - start
+    rate = count / elapsed if elapsed else 0
+    logger.info('Copied {} rows from {} to {} in {:.1f}s ({:.0f} rows/sec)'\
+        .format(count, src, dst, elapsed, rate))
+    return {
+        'rows':             count,
+        'seconds':          elapsed,
+        'rows_per_sec':     rate,
+    }
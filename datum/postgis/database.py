@@ -1,8 +1,19 @@
+from collections import OrderedDict
+from uuid import uuid4
 from datum.util import parse_url
+from datum.postgis.table import FIELD_TYPE_MAP
+from datum.instrument import instrument_cursor
+from datum.postgis.util import to_numbered_params
 # from . import Table
+from contextlib import contextmanager
+from threading import BoundedSemaphore
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 
+# Prepared statements kept on the shared connection before the least recently
+# used is deallocated.
+PREPARED_CACHE_SIZE = 100
 
 class Database(object):
     """Wrapper for a PostGIS database."""
@@ -22,38 +33,171 @@ class Database(object):
 
         # Cache these, but lazy load.
         self._tables = None
+        # Prepared statements on the shared connection: {stmt: name}
+        self._prepared = OrderedDict()
+        # Statements Postgres wouldn't PREPARE, which are run as-is instead
+        self._unpreparable = OrderedDict()
 
         # Format these for psycopg2.
-        params = {
+        self._params = {
            'database':  self.name,
            'user':      self.user,
            'password':  self.password,
            'host':      self.host, 
         }
-        self._cxn = psycopg2.connect(**params)
-        self._c = self._cxn.cursor(cursor_factory=RealDictCursor)
+
+        # With a pool, the connection shared by tables is checked out for the
+        # life of the database and others come and go with `connection()`.
+        # psycopg2 pools raise rather than wait when they're exhausted, so
+        # checkouts wait on a semaphore for one of the remaining slots.
+        self._pool = None
+        if parent.pool_size:
+            self._pool = ThreadedConnectionPool(1, parent.pool_size, \
+                **self._params)
+            self._pool_slots = BoundedSemaphore(parent.pool_size - 1)
+            self._cxn = self._pool.getconn()
+        else:
+            self._cxn = self.new_connection()
+
+    def new_connection(self):
+        """Open a new connection to the database, separate from the one
+        shared by tables (e.g. for reading in another thread)."""
+        return psycopg2.connect(**self._params)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a `with` block. It comes
+        from the pool if there is one; otherwise a new connection is opened
+        and closed afterwards. Uncommitted changes are rolled back when the
+        connection is handed back.
+        """
+        if self._pool:
+            self._pool_slots.acquire()
+            try:
+                cxn = self._pool.getconn()
+            except Exception:
+                self._pool_slots.release()
+                raise
+        else:
+            cxn = self.new_connection()
+        try:
+            yield cxn
+        finally:
+            if self._pool:
+                if not cxn.closed:
+                    cxn.rollback()
+                self._pool.putconn(cxn)
+                self._pool_slots.release()
+            else:
+                cxn.close()
+
+    @contextmanager
+    def cursor(self):
+        """Get a cursor on its own connection for one operation. Changes are
+        committed if the block succeeds and rolled back if it doesn't."""
+        with self.connection() as cxn:
+            c = cxn.cursor(cursor_factory=RealDictCursor)
+            c = instrument_cursor(c, self.parent.instruments)
+            try:
+                yield c
+                cxn.commit()
+            finally:
+                c.close()
+
+    @contextmanager
+    def shared_cursor(self, cursor_factory=RealDictCursor):
+        """
+        Get a cursor on the shared connection for one operation, closed when
+        the block ends. Unlike `cursor`, nothing is committed: changes are
+        part of the shared connection's transaction (see `save`).
+        """
+        c = self._cxn.cursor(cursor_factory=cursor_factory)
+        c = instrument_cursor(c, self.parent.instruments)
+        try:
+            yield c
+        finally:
+            c.close()
 
     def close(self):
-        self._cxn.close()
+        if self._pool:
+            self._pool.closeall()
+        else:
+            self._cxn.close()
+        self._prepared.clear()
+        self._unpreparable.clear()
 
     def save(self):
         """Commit database changes."""
         self._cxn.commit()
 
+    def rollback(self):
+        """Roll back uncommitted database changes."""
+        self._cxn.rollback()
+
     def execute(self, stmt):
         """Execute a SQL statement and return all rows."""
-        self._c.execute(stmt)
-        try:
-            rows = self._c.fetchall()
-        # We already executed the statement, so if there's a ProgrammingError
-        # here it's probably just that no rows were returned.
-        except psycopg2.ProgrammingError:
-            return None
+        with self.shared_cursor() as c:
+            c.execute(stmt)
+            try:
+                rows = c.fetchall()
+            # We already executed the statement, so if there's a
+            # ProgrammingError here it's probably just that no rows were
+            # returned.
+            except psycopg2.ProgrammingError:
+                return None
         # Unpack single value rows
         # if len(rows) > 0 and len(rows[0]) == 1 and isinstance(rows[0], list):
         #     rows = [x[0] for x in rows]
         return rows
 
+    def execute_prepared(self, cursor, stmt, params):
+        """
+        Execute a statement with psycopg2 placeholders as a prepared
+        statement, so the server plans it once and later calls with other
+        values reuse the plan. `cursor` has to be on the shared connection
+        (see `shared_cursor`).
+
+        Prepared statements outlive transactions, so they're kept for the
+        life of the connection; past `PREPARED_CACHE_SIZE` the least recently
+        used is deallocated.
+
+        Postgres won't prepare a statement when it can't infer a parameter's
+        type (e.g. `%s IS NULL`). The PREPARE runs in a savepoint so that
+        doesn't abort the transaction; the statement is then executed with
+        client-side binding, and isn't tried as a prepared statement again.
+        """
+        numbered, values = to_numbered_params(stmt, params)
+        if numbered in self._unpreparable:
+            self._unpreparable.move_to_end(numbered)
+            cursor.execute(stmt, params)
+            return
+        name = self._prepared.get(numbered)
+        if name is None:
+            name = f'datum_{uuid4().hex}'
+            cursor.execute('SAVEPOINT datum_prepare')
+            try:
+                cursor.execute(f'PREPARE {name} AS {numbered}')
+            except psycopg2.Error:
+                cursor.execute('ROLLBACK TO SAVEPOINT datum_prepare')
+                self._unpreparable[numbered] = True
+                if len(self._unpreparable) > PREPARED_CACHE_SIZE:
+                    self._unpreparable.popitem(last=False)
+                cursor.execute(stmt, params)
+                return
+            cursor.execute('RELEASE SAVEPOINT datum_prepare')
+            self._prepared[numbered] = name
+            if len(self._prepared) > PREPARED_CACHE_SIZE:
+                _, oldest = self._prepared.popitem(last=False)
+                cursor.execute(f'DEALLOCATE {oldest}')
+        else:
+            self._prepared.move_to_end(numbered)
+        if values:
+            placeholders = ', '.join(['%s'] * len(values))
+            cursor.execute(f'EXECUTE {name} ({placeholders})', values)
+        else:
+            cursor.execute(f'EXECUTE {name}')
+
 
     """TABLES"""
 
@@ -64,14 +208,66 @@ class Database(object):
         return self._tables
 
     def _get_tables(self):
-        tables = self.table('information_schema.tables').read(where=\
-            "table_schema = 'public' AND table_type = 'BASE TABLE'")
+        tables = self.execute("""
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
+        """)
         return [x['table_name'] for x in tables]
 
     def table(self, name):
         # return Table(self, name)
         return self.parent.table(name)
 
+    def prefetch_metadata(self, schema=None):
+        """
+        Get metadata for all tables (in `schema`, or all non-system schemas)
+        in one catalog query. Returns {table key: {attribute: value}} for the
+        metadata cache. Tables with field types we don't know are skipped so
+        they fail when they're actually used, as they would without a cache.
+        """
+        stmt = """
+            SELECT
+                c.table_schema AS schema,
+                c.table_name AS table,
+                c.column_name AS name,
+                c.data_type AS type,
+                g.type AS geom_type,
+                g.srid
+            FROM information_schema.columns c
+            LEFT JOIN geometry_columns g
+                ON g.f_table_schema = c.table_schema
+                AND g.f_table_name = c.table_name
+                AND g.f_geometry_column = c.column_name
+        """
+        if schema:
+            stmt += f" WHERE c.table_schema = '{schema}'"
+        else:
+            stmt += " WHERE c.table_schema NOT IN ('pg_catalog', 'information_schema')"
+        stmt += " ORDER BY c.table_schema, c.table_name, c.ordinal_position"
+
+        tables = OrderedDict()
+        geom_cols = {}
+        skip = set()
+        for row in self.execute(stmt):
+            key = f"{row['schema']}.{row['table']}".lower()
+            if row['type'] not in FIELD_TYPE_MAP:
+                skip.add(key)
+                continue
+            type_ = FIELD_TYPE_MAP[row['type']]
+            values = tables.setdefault(key, {'metadata': []})
+            values['metadata'].append({'name': row['name'], 'type': type_})
+            if type_ == 'geom':
+                geom_cols.setdefault(key, []).append(row)
+
+        for key, cols in geom_cols.items():
+            # Leave the rest to the table if it's not a single registered
+            # geometry column.
+            if len(cols) == 1 and cols[0]['geom_type'] is not None:
+                tables[key]['geom_type'] = cols[0]['geom_type']
+                tables[key]['srid'] = cols[0]['srid']
+        return OrderedDict((k, v) for k, v in tables.items() if k not in skip)
+
     def create_table(self, name, cols):
         '''
         Creates a table if it doesn't already exist.
@@ -94,12 +290,14 @@ class Database(object):
         col_string = ', '.join(col_string_list)
 
         stmt = f'CREATE TABLE IF NOT EXISTS {name} ({col_string})'
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
 
     def drop_table(self, name):
         stmt = f'DROP TABLE IF EXISTS {name}'
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
 
 
@@ -107,20 +305,24 @@ class Database(object):
 
     def create_view(self, view, select_stmt):
         stmt = f"CREATE VIEW {view} AS {select_stmt}"
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
 
     def drop_view(self, view):
         stmt = f"DROP VIEW IF EXISTS {view}"
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
 
     def create_mview(self, mview, select_stmt):
         stmt = f"CREATE MATERIALIZED VIEW {mview} AS {select_stmt}"
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
 
     def drop_mview(self, mview):
         stmt = f"DROP MATERIALIZED VIEW IF EXISTS {mview}"
-        self._c.execute(stmt)
+        with self.shared_cursor() as c:
+            c.execute(stmt)
         self.save()
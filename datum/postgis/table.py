@@ -1,7 +1,18 @@
-from collections import OrderedDict
 import re
-from datum.util import dbl_quote
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain, groupby
+from uuid import uuid4
+from datum.util import dbl_quote, chunked, iter_threaded, key_ranges, \
+    CommitInterval, check_geom_format, to_wkb, from_wkb_many, run_each, \
+    index_rebuild_error
+from datum.columnar import batches_to_arrow
+from datum.records import check_row_type, field_value, row_factory
+from datum.instrument import instrument_cursor
+from datum.postgis.util import IterStream, encode_copy_text, \
+    encode_copy_binary
 from psycopg2 import ProgrammingError
+from psycopg2.extras import RealDictCursor, execute_values
 
 
 FIELD_TYPE_MAP = {
@@ -20,19 +31,30 @@ FIELD_TYPE_MAP = {
     'bytea':                'text'
 }
 
+# Rows fetched per round trip by server-side cursors (psycopg2's default).
+DEFAULT_ITERSIZE = 2000
+# Rows per INSERT statement for execute_values writes.
+DEFAULT_PAGE_SIZE = 1000
+
+# Functions for reading geometries in each format
+GEOM_OUTPUT_FUNCS = {
+    'wkt':          'ST_AsText',
+    'wkb':          'ST_AsBinary',
+    'ewkb':         'ST_AsEWKB',
+    'shapely':      'ST_AsBinary',
+}
+
 class Table(object):
     """PostGIS table."""
     def __init__(self, parent):
         self._parent = parent
         self.db = parent.db
         self.schema = parent.schema if parent.schema not in ['', 'None', None] else 'public'
-        self._c = self.db._c
-        self.metadata = self._get_metadata()
-        self.geom_type = self._get_geom_type() if self.geom_field else None
-        self.srid = self._get_srid() if self.geom_field else None
 
         # Lazy cache
         self._pk_field = None
+        # Metadata attributes, loaded on first access (see `_lazy`)
+        self._lazy_values = {}
 
     def __str__(self):
         return f'Table: {self.name}'
@@ -41,6 +63,11 @@ class Table(object):
     def name(self):
         return self._parent.name
 
+    @property
+    def _cache_key(self):
+        """Identifies the table in the metadata cache."""
+        return f'{self.schema}.{self.name}'.lower()
+
     @property
     def _name_p(self):
         """The table name prepared for SQL queries."""
@@ -51,23 +78,93 @@ class Table(object):
         else:
             return dbl_quote(name)
 
-    def _wkt_getter(self, geom_field, to_srid=None):
+    def _wkt_getter(self, geom_field, to_srid=None, geom_format='wkt'):
+        """Returns a SELECT item for the geometry in `geom_format`. Shapely
+        geometries are read as WKB and parsed afterwards (see
+        `_convert_geoms`)."""
         assert geom_field is not None
         geom_getter = geom_field
         if to_srid:
             geom_getter = f'ST_Transform({geom_getter}, {to_srid})'
-        return f'ST_AsText({geom_getter}) AS {geom_field}'
+        func = GEOM_OUTPUT_FUNCS[geom_format]
+        return f'{func}({geom_getter}) AS {geom_field}'
+
+    def _convert_geoms(self, batches, geom_field, geom_format):
+        """Turn binary geometries in batches of rows into bytes (psycopg2
+        returns memoryviews) or shapely geometries. `geom_field` is a key for
+        dict rows or an index for tuple rows."""
+        for batch in batches:
+            with self.db.timer(self.name, 'read', 'geometry', rows=len(batch)):
+                if geom_format == 'shapely':
+                    geoms = from_wkb_many(row[geom_field] for row in batch)
+                else:
+                    geoms = [to_wkb(row[geom_field]) for row in batch]
+            if isinstance(geom_field, int):
+                batch = [row[:geom_field] + (geom,) + row[geom_field + 1:] \
+                    for row, geom in zip(batch, geoms)]
+            else:
+                for row, geom in zip(batch, geoms):
+                    row[geom_field] = geom
+            yield batch
+
+    def _named_fields(self, fields, aliases, geom_field, return_geom):
+        """
+        Spell out the fields for a read that gets rows as tuples, so they're
+        in a known order. Returns the fields to select, the names they come
+        back as, and the geometry field if it's selected (always last).
+        """
+        geom_field = geom_field or self.geom_field
+        # Name the fields so the geometry isn't also selected raw by `*`
+        fields = list(fields or self.non_geom_fields)
+        names = [aliases.get(x, x) for x in fields] if aliases else fields
+        if geom_field and return_geom:
+            names = names + [geom_field]
+        else:
+            geom_field = None
+        return fields, names, geom_field
+
+    def _make_rows(self, batches, names, row_type):
+        """Turn batches of tuples into batches of `row_type` rows."""
+        if row_type == 'tuple':
+            return batches
+        make_row = row_factory(row_type, names)
+        return ([make_row(row) for row in batch] for batch in batches)
 
     @property
     def count(self):
         return self._exec(f'SELECT COUNT(*) FROM {self._name_p}')[0]
 
-    def _exec(self, stmt):
-        self._c.execute(stmt)
-        try:
-            return self._c.fetchall()
-        except ProgrammingError:
-            return
+    def _exec(self, stmt, params=None):
+        with self.db.shared_cursor() as c:
+            c.execute(stmt, params)
+            try:
+                return c.fetchall()
+            except ProgrammingError:
+                return
+
+    def _lazy(self, attr, getter):
+        """Get a metadata attribute, computing it (or getting it from the
+        database's metadata cache) the first time it's asked for."""
+        if attr not in self._lazy_values:
+            self._lazy_values[attr] = self.db.cached_metadata(self._cache_key, \
+                attr, getter)
+        return self._lazy_values[attr]
+
+    @property
+    def metadata(self):
+        return self._lazy('metadata', self._get_metadata)
+
+    @property
+    def geom_type(self):
+        if not self.geom_field:
+            return None
+        return self._lazy('geom_type', self._get_geom_type)
+
+    @property
+    def srid(self):
+        if not self.geom_field:
+            return None
+        return self._lazy('srid', self._get_srid)
 
     def _get_metadata(self):
         stmt = f"""
@@ -127,9 +224,15 @@ class Table(object):
             self._pk_field = self._exec(stmt)[0]['name']
         return self._pk_field
 
-    def read(self, fields=None, aliases=None, geom_field=None, \
-        return_geom=True, to_srid=None, limit=None, where=None, sort=None):
-        """Read a DB table."""
+    def _read_stmt(self, fields=None, aliases=None, geom_field=None, \
+        return_geom=True, to_srid=None, limit=None, where=None, sort=None, \
+        since=None, watermark_field=None, geom_format='wkt', params=None):
+        """Form the SELECT statement for a read. If `since` is given, only
+        rows with a `watermark_field` greater than it are selected.
+
+        Returns the statement and its parameters. With `params` (a sequence
+        for `%s` placeholders in `where` or a dict for `%(name)s`), `since`
+        and `limit` are bound as well instead of formatted in."""
         # Enclose table name in quotes in case there are casing issues
         table_name = self._name_p
 
@@ -144,16 +247,28 @@ class Table(object):
             else:
                 fields = [dbl_quote(x) for x in fields]
             if geom_field and return_geom:
-                wkt_getter = self._wkt_getter(geom_field, to_srid=to_srid)
+                wkt_getter = self._wkt_getter(geom_field, to_srid=to_srid, \
+                    geom_format=geom_format)
                 fields.append(wkt_getter)
             fields_joined = ', '.join(fields)
             stmt = f"SELECT {fields_joined} FROM {self.schema}.{table_name}"
         else:
             if geom_field and return_geom:
-                wkt_getter = self._wkt_getter(geom_field, to_srid=to_srid)
+                wkt_getter = self._wkt_getter(geom_field, to_srid=to_srid, \
+                    geom_format=geom_format)
                 stmt = f"SELECT {table_name}.*, {wkt_getter} FROM {self.schema}.{table_name}"
             else:
                 stmt = f"SELECT * FROM {self.schema}.{table_name}"
+        if since is not None:
+            if not watermark_field:
+                raise ValueError('Reading since a watermark requires a watermark_field')
+            if params is None:
+                with self.db.shared_cursor() as c:
+                    since_sql = c.mogrify('%s', (since,)).decode()
+            else:
+                since_sql, params = self._bind(params, 'datum_since', since)
+            since_where = f'{dbl_quote(watermark_field)} > {since_sql}'
+            where = f'({where}) AND {since_where}' if where else since_where
         if where:
             stmt += f" WHERE {where}"
         if sort:
@@ -163,9 +278,209 @@ class Table(object):
                 stmt += f" ORDER BY {sort}"
 
         if limit:
-            stmt += f" LIMIT {limit}"
-        self._c.execute(stmt)
-        return self._c.fetchall()
+            if params is None:
+                stmt += f" LIMIT {limit}"
+            else:
+                limit_sql, params = self._bind(params, 'datum_limit', limit)
+                stmt += f" LIMIT {limit_sql}"
+        return stmt, params
+
+    def _bind(self, params, name, value):
+        """Add a value to a read's parameters, returning its placeholder
+        and the new parameters."""
+        if isinstance(params, dict):
+            return f'%({name})s', dict(params, **{name: value})
+        return '%s', list(params) + [value]
+
+    def read(self, fields=None, aliases=None, geom_field=None, \
+        return_geom=True, to_srid=None, limit=None, where=None, sort=None, \
+        since=None, watermark_field=None, geom_format='wkt', \
+        row_type='dict', stream=False, itersize=None, parallel=None, \
+        key_field=None, params=None):
+        """Read a DB table. Pass `stream=True` to get a generator of rows
+        (see `read_iter`) instead of a list.
+
+        `where` can have psycopg2 placeholders (`%s` or `%(name)s`) with
+        their values in `params`. Those reads are run as prepared statements
+        (see `Database.execute_prepared`), so repeating one with different
+        values reuses the server's plan. Literal percent signs in `where`
+        have to be doubled (`%%`) when there are params.
+
+        Geometries come back as `geom_format`: 'wkt' (the default), 'wkb',
+        'ewkb' (bytes) or 'shapely' (geometry objects; needs shapely).
+
+        Rows are dicts unless `row_type` is 'tuple', 'namedtuple' or 'record'
+        (see `records.Record`), which are fetched as tuples and take much
+        less memory."""
+        check_geom_format(geom_format)
+        check_row_type(row_type)
+        kwargs = dict(fields=fields, aliases=aliases, geom_field=geom_field, \
+            return_geom=return_geom, to_srid=to_srid, limit=limit, \
+            where=where, sort=sort, since=since, \
+            watermark_field=watermark_field, geom_format=geom_format, \
+            params=params)
+        if stream or parallel:
+            rows = self.read_iter(itersize=itersize, parallel=parallel, \
+                key_field=key_field, row_type=row_type, **kwargs)
+            return rows if stream else list(rows)
+        cursor_factory = RealDictCursor
+        if row_type != 'dict':
+            fields, names, geom_field = self._named_fields(fields, aliases, \
+                geom_field, return_geom)
+            kwargs.update(fields=fields, geom_field=geom_field)
+            cursor_factory = None
+        with self.db.shared_cursor(cursor_factory=cursor_factory) as c:
+            with self.db.timer(self.name, 'read', 'query'):
+                self._execute_read(c, *self._read_stmt(**kwargs))
+            with self.db.timer(self.name, 'read', 'fetch') as timer:
+                rows = c.fetchall()
+                timer.rows = len(rows)
+        if row_type != 'dict':
+            batches = [rows]
+            if geom_field and geom_format != 'wkt':
+                batches = self._convert_geoms(batches, len(names) - 1, \
+                    geom_format)
+            return list(self._iter_rows(self._make_rows(batches, names, \
+                row_type)))
+        geom_field = geom_field or self.geom_field
+        if geom_field and return_geom and geom_format != 'wkt':
+            rows = next(self._convert_geoms([rows], geom_field, geom_format))
+        return rows
+
+    def _execute_read(self, c, stmt, params):
+        if params is None:
+            c.execute(stmt)
+        else:
+            self.db._child.execute_prepared(c, stmt, params)
+
+    def read_iter(self, fields=None, aliases=None, geom_field=None, \
+        return_geom=True, to_srid=None, limit=None, where=None, sort=None, \
+        since=None, watermark_field=None, geom_format='wkt', \
+        row_type='dict', itersize=None, parallel=None, key_field=None, \
+        params=None):
+        """
+        Lazily read a DB table, yielding one row at a time.
+
+        This uses a named (server-side) cursor on its own, so rows are pulled
+        over in batches of `itersize` and the shared cursor stays free for
+        other statements (e.g. writing the rows out to another table). The
+        cursor is declared WITH HOLD so it survives commits made mid-read.
+
+        With `parallel=N`, the table is split into N ranges of `key_field`
+        (the primary key by default) which are read concurrently, each on its
+        own connection. Rows come back in no particular order.
+
+        Geometries are converted to `geom_format` a batch at a time, and rows
+        are made into `row_type` (see `read`). `where` can be parameterized
+        with `params` as for `read`, but named cursors can't run prepared
+        statements, so the values are bound client-side.
+        """
+        check_geom_format(geom_format)
+        check_row_type(row_type)
+        cursor_factory = RealDictCursor
+        if row_type != 'dict':
+            fields, names, geom_field = self._named_fields(fields, aliases, \
+                geom_field, return_geom)
+            cursor_factory = None
+        kwargs = dict(fields=fields, aliases=aliases, geom_field=geom_field, \
+            return_geom=return_geom, to_srid=to_srid, limit=limit, \
+            where=where, sort=sort, since=since, \
+            watermark_field=watermark_field, geom_format=geom_format, \
+            params=params)
+        if parallel:
+            batches = self._read_parallel(parallel, itersize=itersize, \
+                key_field=key_field, cursor_factory=cursor_factory, **kwargs)
+        else:
+            stmt, params = self._read_stmt(**kwargs)
+            batches = self._fetch_batches(stmt, params=params, \
+                itersize=itersize, cursor_factory=cursor_factory)
+        geom_field = geom_field or self.geom_field
+        if geom_field and return_geom and geom_format != 'wkt':
+            geom_key = geom_field if row_type == 'dict' else len(names) - 1
+            batches = self._convert_geoms(batches, geom_key, geom_format)
+        if row_type != 'dict':
+            batches = self._make_rows(batches, names, row_type)
+        return self._iter_rows(batches)
+
+    def read_arrow(self, fields=None, aliases=None, geom_field=None, \
+        return_geom=True, to_srid=None, limit=None, where=None, sort=None, \
+        since=None, watermark_field=None, itersize=None, params=None):
+        """
+        Read a DB table into a pyarrow Table, with the geometry as a WKB
+        column (see `columnar.batches_to_arrow`). Rows are fetched as tuples
+        `itersize` at a time and converted one batch at a time.
+        """
+        fields, names, geom_field = self._named_fields(fields, aliases, \
+            geom_field, return_geom)
+        stmt, params = self._read_stmt(fields=fields, aliases=aliases, \
+            geom_field=geom_field, return_geom=return_geom, to_srid=to_srid, \
+            limit=limit, where=where, sort=sort, since=since, \
+            watermark_field=watermark_field, geom_format='wkb', params=params)
+        batches = self._fetch_batches(stmt, params=params, itersize=itersize, \
+            cursor_factory=None)
+        return batches_to_arrow(batches, names, geom_field=geom_field, \
+            srid=to_srid or self.srid)
+
+    def _iter_rows(self, batches):
+        for batch in batches:
+            for row in batch:
+                yield row
+
+    def _fetch_batches(self, stmt, params=None, itersize=None, cxn=None, \
+        cursor_factory=RealDictCursor):
+        """Execute a statement on a named cursor and yield lists of up to
+        `itersize` rows (dicts, or tuples with `cursor_factory=None`). Uses
+        the shared connection unless `cxn` is given."""
+        cxn = cxn or self.db._child._cxn
+        c = cxn.cursor(name=f'datum_{uuid4().hex}', \
+            cursor_factory=cursor_factory, withhold=True)
+        c = instrument_cursor(c, self.db.instruments)
+        itersize = itersize or DEFAULT_ITERSIZE
+        try:
+            with self.db.timer(self.name, 'read', 'query'):
+                c.execute(stmt, params)
+            while True:
+                with self.db.timer(self.name, 'read', 'fetch') as timer:
+                    batch = c.fetchmany(itersize)
+                    timer.rows = len(batch)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            c.close()
+
+    def _read_parallel(self, parallel, itersize=None, key_field=None, \
+        where=None, limit=None, sort=None, cursor_factory=RealDictCursor, \
+        params=None, **kwargs):
+        """Read ranges of an integer key concurrently, returning batches of
+        rows."""
+        if limit or sort:
+            raise ValueError('Parallel reads cannot be limited or sorted')
+        key = dbl_quote(key_field or self.pk_field)
+        stmt = f"SELECT MIN({key}) AS lo, MAX({key}) AS hi FROM {self.schema}.{self._name_p}"
+        if where:
+            stmt += f" WHERE {where}"
+        bounds = self._exec(stmt, params)[0]
+        if bounds['lo'] is None:
+            return iter([])
+
+        def range_reader(start, end):
+            range_where = f"{key} >= {start} AND {key} < {end}"
+            if where:
+                range_where = f"({where}) AND {range_where}"
+            stmt, range_params = self._read_stmt(where=range_where, \
+                params=params, **kwargs)
+            def read_range():
+                with self.db.connection() as cxn:
+                    for batch in self._fetch_batches(stmt, \
+                        params=range_params, itersize=itersize, cxn=cxn, \
+                        cursor_factory=cursor_factory):
+                        yield batch
+            return read_range
+
+        readers = [range_reader(start, end) for start, end in \
+            key_ranges(bounds['lo'], bounds['hi'], parallel)]
+        return iter_threaded(readers, queue_size=2 * len(readers))
 
     def delete(self, cascade=False):
         """Delete all rows."""
@@ -173,33 +488,109 @@ class Table(object):
         # RESTART IDENTITY resets sequence generators.
         stmt = f"TRUNCATE {name} RESTART IDENTITY"
         stmt += ' CASCADE' if cascade else ''
-        self._c.execute(stmt)
+        with self.db.shared_cursor() as c:
+            c.execute(stmt)
         self.db.save()
 
-    def _prepare_geom(self, geom, srid, transform_srid=None, multi_geom=True):
-        """Prepares WKT geometry by projecting and casting as necessary."""
-        geom = f"ST_GeomFromText('{geom}', {srid})"
+    def delete_many(self, keys, key_field=None, chunk_size=10000):
+        """
+        Delete rows whose `key_field` (the primary key by default) is in
+        `keys`, `chunk_size` keys per statement.
+        """
+        key = dbl_quote(key_field or self.pk_field)
+        stmt = f"DELETE FROM {self.schema}.{self._name_p} WHERE {key} = ANY(%s)"
+        count = 0
+        with self.db.shared_cursor() as c:
+            for chunk in chunked(keys, chunk_size):
+                c.execute(stmt, (chunk,))
+                count += c.rowcount
+        self._save()
+        return count
+
+    def get_many(self, keys, key_field=None, fields=None, chunk_size=10000, \
+        **kwargs):
+        """
+        Read rows whose `key_field` (the primary key by default) is in
+        `keys`, `chunk_size` keys per statement, and return them as
+        {key: row}. Each chunk is bound as one array, so every chunk runs the
+        same prepared statement. Other arguments are passed to `read`.
+        """
+        key_field = key_field or self.pk_field
+        if fields and key_field not in fields:
+            fields = list(fields) + [key_field]
+        name = (kwargs.get('aliases') or {}).get(key_field, key_field)
+        where = f"{dbl_quote(key_field)} = ANY(%s)"
+        rows = {}
+        for chunk in chunked(keys, chunk_size):
+            for row in self.read(fields=fields, where=where, params=[chunk], \
+                **kwargs):
+                rows[field_value(row, name)] = row
+        return rows
 
+    def _clean_wkt(self, wkt):
+        """
+        Screens a WKT geometry for things PostGIS needs help with. Returns the
+        cleaned WKT and flags for whether it has to be forced to 2D and
+        whether it contains curves.
+        """
         # Handle 3D geometries
         # TODO: screen these with regex
-        if 'NaN' in geom:
-            geom = geom.replace('NaN', '0')
+        force_2d = 'NaN' in wkt
+        if force_2d:
+            wkt = wkt.replace('NaN', '0')
+        curve = 'CURVE' in wkt or wkt.startswith('CIRC')
+        return wkt, force_2d, curve
+
+    def _geom_sql(self, wkt_sql, srid, force_2d=False, curve=False, \
+        transform_srid=None, multi_geom=True, geom_format='wkt'):
+        """Wraps a SQL expression for WKT (a literal or a placeholder) in the
+        functions needed to project and cast it. For the binary formats, the
+        expression is WKB or EWKB as bytea instead. These can't be screened
+        for curves like WKT, so that's done in SQL. EWKB keeps its embedded
+        SRID (or `srid` if it has none) and is reprojected to
+        `transform_srid` or the table's SRID."""
+        if geom_format == 'wkt':
+            geom = f"ST_GeomFromText({wkt_sql}, {srid})"
+        else:
+            if geom_format == 'ewkb':
+                to_srid = transform_srid or self.srid
+                parse = f"""(SELECT ST_Transform(CASE WHEN ST_SRID(e.g) = 0
+                    THEN ST_SetSRID(e.g, {srid}) ELSE e.g END, {to_srid})
+                    FROM (SELECT ST_GeomFromEWKB({wkt_sql}) AS g) e)"""
+            else:
+                parse = f"ST_GeomFromWKB({wkt_sql}, {srid})"
+            geom = f"""(SELECT CASE WHEN ST_HasArc(b.g) THEN ST_CurveToLine(b.g)
+                ELSE b.g END FROM (SELECT {parse} AS g) b)"""
+
+        if force_2d:
             geom = f"ST_Force2D({geom})" # in Postgres v3 and later, name has no underscore after "Force"
 
         # Convert curve geometries (these aren't supported by PostGIS)
-        if 'CURVE' in geom or geom.startswith('CIRC'):
+        if curve:
             geom = f"ST_CurveToLine({geom})"
         # Reproject if necessary
-        if transform_srid and srid != transform_srid:
+        if transform_srid and srid != transform_srid and geom_format != 'ewkb':
              geom = f"ST_Transform({geom}, {transform_srid})"
-        # else:
-        #   geom = f"ST_GeomFromText('{geom}', {from_srid})"
 
         if multi_geom:
             geom = f'ST_Multi({geom})'
 
         return geom
 
+    def _prepare_geom(self, geom, srid, transform_srid=None, multi_geom=True, \
+        geom_format='wkt'):
+        """Prepares WKT geometry by projecting and casting as necessary."""
+        if geom_format != 'wkt':
+            if geom is None:
+                return 'NULL'
+            wkb_sql = f"decode('{to_wkb(geom).hex()}', 'hex')"
+            return self._geom_sql(wkb_sql, srid, \
+                transform_srid=transform_srid, multi_geom=multi_geom, \
+                geom_format=geom_format)
+        geom, force_2d, curve = self._clean_wkt(geom)
+        return self._geom_sql(f"'{geom}'", srid, force_2d=force_2d, \
+            curve=curve, transform_srid=transform_srid, multi_geom=multi_geom)
+
     def _prepare_val(self, val, type_):
         """Prepare a value for entry into the DB."""
         if type_ == 'text':
@@ -225,87 +616,713 @@ class Table(object):
         """Convenience method for committing changes."""
         self.db.save()
 
-    def write(self, rows, from_srid=None, chunk_size=None):
+    def _get_multi_geom(self):
+        """Do we need to cast the geometry to a MULTI type? (Assuming all rows
+        have the same geom type.)"""
+        # for service area polygons from Postgres, both these will start with MULTI; old condition results in
+        # "psycopg2.errors.InvalidParameterValue: Geometry type (Polygon) does not match column type (MultiPolygon)""
+        return self.geom_type.startswith('MULTI')
+
+    def _get_type_map(self, fields):
+        """Make a map of field name => type"""
+        type_map = OrderedDict()
+        for field in fields:
+            try:
+                type_map[field] = [x['type'] for x in self.metadata if x['name'] == field][0]
+            except IndexError:
+                raise ValueError(f'Field `{field}` does not exist')
+        return type_map
+
+    def _get_upsert_clause(self, fields, key=None):
+        """
+        Returns an ON CONFLICT clause that updates existing rows matching on
+        `key` (a field name or list of them; the primary key by default). The
+        key needs a unique index or constraint.
+        """
+        key = key or self.pk_field
+        keys = [key] if isinstance(key, str) else list(key)
+        missing = [x for x in keys if x not in fields]
+        if missing:
+            raise ValueError(f"Upsert key field(s) missing from rows: {', '.join(missing)}")
+        keys_joined = ', '.join(dbl_quote(x) for x in keys)
+        updates = [f'{dbl_quote(x)} = EXCLUDED.{dbl_quote(x)}' \
+            for x in fields if x not in keys]
+        if not updates:
+            return f' ON CONFLICT ({keys_joined}) DO NOTHING'
+        return f" ON CONFLICT ({keys_joined}) DO UPDATE SET {', '.join(updates)}"
+
+    def write(self, rows, from_srid=None, chunk_size=None, method=None, \
+        copy_format='text', page_size=DEFAULT_PAGE_SIZE, mode='append', \
+        key=None, atomic_swap=False, commit_every=None, geom_format='wkt'):
         """
         Inserts dictionary row objects in the the database
-        Args: list of row dicts, table name, ordered field names
+        Args: iterable of row dicts, table name, ordered field names
+
+        Rows are consumed `chunk_size` at a time, so they can come from a
+        generator (e.g. `read_iter`) instead of a list.
+
+        `method` is one of:
+            insert: multi-row INSERT statements (the default for appends)
+            values: parameterized INSERTs via execute_values (see
+                    `_write_values`)
+            copy:   stream rows through COPY (see `_write_copy`; the default
+                    for upserts)
+
+        `mode` is one of:
+            append: insert all rows (the default)
+            upsert: update rows that match on `key` (see
+                    `_get_upsert_clause`) and insert the rest. With
+                    COPY, rows are matched from a staging table.
+
+        By default each chunk is committed as it's written. `commit_every`
+        can be a number of rows to write between commits, or 'end' to commit
+        once everything has been written (see also `Database.transaction`).
+
+        Geometries can be given as `geom_format` 'wkt' (the default), 'wkb',
+        'ewkb' or 'shapely'. Binary geometries are passed to PostGIS as-is;
+        EWKB in another SRID is reprojected to the table's.
+
+        With `atomic_swap=True`, the rows replace the table's contents: they
+        are loaded into a staging copy which is swapped in once it's indexed
+        (see `_write_swap`).
         """
-        if len(rows) == 0:
+        if mode not in ('append', 'upsert'):
+            raise ValueError(f"Unknown write mode: '{mode}'")
+        check_geom_format(geom_format)
+        # Shapely geometries go over the wire as WKB
+        if geom_format == 'shapely':
+            geom_format = 'wkb'
+        if atomic_swap:
+            if mode == 'upsert':
+                raise ValueError('Atomic swaps replace the table and cannot upsert')
+            return self._write_swap(rows, from_srid=from_srid, \
+                chunk_size=chunk_size, method=method, \
+                copy_format=copy_format, page_size=page_size, \
+                commit_every=commit_every, geom_format=geom_format)
+        upsert_key = key if mode == 'upsert' else None
+        method = method or ('copy' if mode == 'upsert' else 'insert')
+        if method == 'copy':
+            return self._write_copy(rows, from_srid=from_srid, \
+                chunk_size=chunk_size, copy_format=copy_format, \
+                upsert=mode == 'upsert', key=upsert_key, \
+                commit_every=commit_every, geom_format=geom_format)
+        elif method == 'values':
+            return self._write_values(rows, from_srid=from_srid, \
+                chunk_size=chunk_size, page_size=page_size, \
+                upsert=mode == 'upsert', key=upsert_key, \
+                commit_every=commit_every, geom_format=geom_format)
+        elif method != 'insert':
+            raise ValueError(f"Unknown write method: '{method}'")
+
+        # Rows can be any iterable, so work through them a chunk at a time.
+        chunks = chunked(rows, chunk_size)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
             return
 
         # Get fields from the row because some fields from self.fields may be
         # optional, such as autoincrementing integers.
-        fields = rows[0].keys()
+        fields = first_chunk[0].keys()
         geom_field = self.geom_field
         srid = from_srid or self.srid
-        row_geom_type = re.match('[A-Z]+', rows[0][geom_field]).group() \
-            if geom_field else None
-        table_geom_type = self.geom_type if geom_field else None
 
-        # Do we need to cast the geometry to a MULTI type? (Assuming all rows
-        # have the same geom type.)
         if geom_field:
-            # for service area polygons from Postgres, both these will start with MULTI; old condition results in
-            # "psycopg2.errors.InvalidParameterValue: Geometry type (Polygon) does not match column type (MultiPolygon)""
-            if self.geom_type.startswith('MULTI'): # and \
-                #not row_geom_type.startswith('MULTI'):
-                multi_geom = True
-            else:
-                multi_geom = False
+            multi_geom = self._get_multi_geom()
 
-        # Make a map of non geom field name => type
-        type_map = OrderedDict()
-        for field in fields:
-            try:
-                type_map[field] = [x['type'] for x in self.metadata if x['name'] == field][0]
-            except IndexError:
-                raise ValueError(f'Field `{field}` does not exist')
-        type_map_items = type_map.items()
+        type_map_items = self._get_type_map(fields).items()
 
         fields_joined = ', '.join(fields)
         stmt = f"INSERT INTO {self.name} ({fields_joined}) VALUES "
-
-        len_rows = len(rows)
-        if chunk_size is None or len_rows < chunk_size:
-            iterations = 1
-        else:
-            iterations = int(len_rows / chunk_size)
-            iterations += (len_rows % chunk_size > 0)  # round up
+        upsert_clause = self._get_upsert_clause(fields, key=key) \
+            if mode == 'upsert' else ''
+        commits = CommitInterval(self._save, commit_every)
 
         # Make list of value lists
-        for i in range(0, iterations):
+        for chunk in chain([first_chunk], chunks):
             val_rows = []
             cur_stmt = stmt
-            if chunk_size:
-                start = i * chunk_size
-                end = min(len_rows, start + chunk_size)
-            else:
-                start = i
-                end = len_rows
 
-            for row in rows[start:end]:
-                val_row = []
-                for field, type_ in type_map_items:
-                    if type_ == 'geom':
-                        geom = row[geom_field]
-                        val = self._prepare_geom(geom, srid, multi_geom=multi_geom)
-                        val_row.append(val)
+            with self.db.timer(self.name, 'write', 'prepare', rows=len(chunk)):
+                for row in chunk:
+                    val_row = []
+                    for field, type_ in type_map_items:
+                        if type_ == 'geom':
+                            geom = row[geom_field]
+                            val = self._prepare_geom(geom, srid, \
+                                multi_geom=multi_geom, geom_format=geom_format)
+                            val_row.append(val)
 
-                    else:
-                        val = self._prepare_val(row[field], type_)
-                        val_row.append(val)
-                val_rows.append(val_row)
+                        else:
+                            val = self._prepare_val(row[field], type_)
+                            val_row.append(val)
+                    val_rows.append(val_row)
+
+                vals_joined = [f"({', '.join(vals)})" for vals in val_rows]
+                rows_joined = ', '.join(vals_joined)
+                cur_stmt += rows_joined + upsert_clause
 
             # Execute
-            vals_joined = [f"({', '.join(vals)})" for vals in val_rows]
-            rows_joined = ', '.join(vals_joined)
-            cur_stmt += rows_joined
-            self._c.execute(cur_stmt)
+            with self.db.timer(self.name, 'write', 'execute', \
+                rows=len(chunk)), self.db.shared_cursor() as c:
+                c.execute(cur_stmt)
+            commits.chunk_written(len(chunk))
+        commits.finish()
+
+    def _write_values(self, rows, from_srid=None, chunk_size=None, \
+        page_size=DEFAULT_PAGE_SIZE, upsert=False, key=None, \
+        commit_every=None, geom_format='wkt'):
+        """
+        Insert rows with `psycopg2.extras.execute_values`, passing values as
+        parameters rather than building them into the SQL by hand.
+
+        Each statement holds up to `page_size` rows. If `chunk_size` is given,
+        changes are committed after each chunk (or per `commit_every`);
+        otherwise rows are streamed through `page_size` at a time and
+        committed once at the end.
+        """
+        rows = iter(rows)
+        try:
+            first = next(rows)
+        except StopIteration:
+            return
+        rows = chain([first], rows)
+
+        fields = list(first.keys())
+        type_map_items = list(self._get_type_map(fields).items())
+        geom_field = self.geom_field
+        srid = from_srid or self.srid
+        multi_geom = self._get_multi_geom() if geom_field else False
+
+        fields_joined = ', '.join(dbl_quote(x) for x in fields)
+        stmt = f"INSERT INTO {self.schema}.{self._name_p} ({fields_joined}) VALUES %s"
+        if upsert:
+            stmt += self._get_upsert_clause(fields, key=key)
+
+        # One template per combination of geometry flags
+        templates = {}
+        def get_template(flags):
+            if flags not in templates:
+                force_2d, curve = flags
+                placeholders = [self._geom_sql('%s', srid, force_2d=force_2d, \
+                    curve=curve, multi_geom=multi_geom, \
+                    geom_format=geom_format) if type_ == 'geom' \
+                    else '%s' for _, type_ in type_map_items]
+                templates[flags] = f"({', '.join(placeholders)})"
+            return templates[flags]
+
+        def val_rows(chunk):
+            """Yield (geometry flags, values) for each row."""
+            for row in chunk:
+                flags = (False, False)
+                vals = []
+                for field, type_ in type_map_items:
+                    val = row[field]
+                    if type_ == 'text':
+                        val = str(val) if val else ''
+                    elif type_ == 'geom' and val is not None:
+                        if geom_format == 'wkt':
+                            val, force_2d, curve = self._clean_wkt(val)
+                            flags = (force_2d, curve)
+                        else:
+                            val = to_wkb(val)
+                    vals.append(val)
+                yield flags, vals
+
+        if not chunk_size and commit_every is None:
+            commit_every = 'end'
+        commits = CommitInterval(self._save, commit_every)
+        for chunk in chunked(rows, chunk_size or page_size):
+            # Rows with different geometry flags need different templates, so
+            # insert runs of consecutive rows that share them.
+            with self.db.timer(self.name, 'write', 'prepare', rows=len(chunk)):
+                runs = [(flags, [vals for _, vals in run]) for flags, run \
+                    in groupby(val_rows(chunk), key=lambda x: x[0])]
+            with self.db.timer(self.name, 'write', 'execute', \
+                rows=len(chunk)), self.db.shared_cursor() as c:
+                for flags, run_vals in runs:
+                    execute_values(c, stmt, run_vals, \
+                        template=get_template(flags), page_size=page_size)
+            commits.chunk_written(len(chunk))
+        commits.finish()
+
+    def _get_column_types(self):
+        """Returns a map of column name => full Postgres type name."""
+        stmt = f"""
+            SELECT attname AS name, format_type(atttypid, atttypmod) AS type
+            FROM pg_attribute
+            WHERE attrelid = '{self.schema}.{self._name_p}'::regclass
+            AND attnum > 0
+            AND NOT attisdropped
+        """
+        return {x['name']: x['type'] for x in self._exec(stmt)}
+
+    def _copy_val(self, val, type_, geom_format='wkt'):
+        """Prepare a value for COPY. Mirrors `_prepare_val`, but returns
+        unquoted text (or None for NULL). Binary geometries are hex-encoded."""
+        if type_ == 'geom' and geom_format != 'wkt' and val is not None:
+            return to_wkb(val).hex()
+        if type_ == 'text':
+            return str(val) if val else ''
+        elif type_ in ('num', 'date', 'geom'):
+            return None if val is None else str(val)
+        raise TypeError(f"Unhandled type: '{type_}'")
+
+    def _geom_from_staging(self, col, srid, multi_geom=True, geom_format='wkt'):
+        """
+        Returns a FROM-clause item that turns the WKT in staging column `col`
+        into a geometry called `geom`. This applies the same cleanup as
+        `_prepare_geom`, but per row in SQL rather than by sniffing literals.
+        Binary geometries are staged as hex and parsed by `_geom_sql`, which
+        handles their curves and SRID.
+        """
+        if geom_format == 'wkt':
+            from_text = f"ST_GeomFromText({col}, {srid})"
+            from_text_2d = f"ST_Force2D(ST_GeomFromText(replace({col}, 'NaN', '0'), {srid}))"
+            parse = f"""CASE WHEN strpos({col}, 'NaN') > 0
+                THEN {from_text_2d} ELSE {from_text} END"""
+        else:
+            parse = self._geom_sql(f"decode({col}, 'hex')", srid, \
+                multi_geom=False, geom_format=geom_format)
+        geom = 'g.geom'
+        # Convert curve geometries
+        if geom_format == 'wkt':
+            geom = f"CASE WHEN ST_HasArc({geom}) THEN ST_CurveToLine({geom}) ELSE {geom} END"
+        if multi_geom:
+            geom = f'ST_Multi({geom})'
+        lateral = f"""
+            LATERAL (SELECT {parse} AS geom) g
+        """
+        return geom, lateral
+
+    def _write_copy(self, rows, from_srid=None, chunk_size=None, \
+        copy_format='text', upsert=False, key=None, commit_every=None, \
+        geom_format='wkt'):
+        """
+        Bulk load rows with COPY.
+
+        Rows are streamed in `copy_format` ('text' or 'binary') into a
+        temporary all-text staging table, then cast and inserted into the
+        table with a single INSERT ... SELECT, which is also where geometry
+        cleanup and MULTI casting happen. `rows` can be any iterable; nothing
+        is materialized beyond the COPY buffer. If `chunk_size` is given, each
+        chunk is loaded separately and committed per `commit_every`.
+        """
+        if copy_format not in ('text', 'binary'):
+            raise ValueError(f"Unknown COPY format: '{copy_format}'")
+
+        rows = iter(rows)
+        try:
+            first = next(rows)
+        except StopIteration:
+            return
+        rows = chain([first], rows)
+
+        # Get fields from the row because some fields from self.fields may be
+        # optional, such as autoincrementing integers.
+        fields = list(first.keys())
+        type_map_items = list(self._get_type_map(fields).items())
+        geom_field = self.geom_field
+        srid = from_srid or self.srid
+        col_types = self._get_column_types()
+        upsert_clause = self._get_upsert_clause(fields, key=key) \
+            if upsert else ''
+
+        # Stage everything as text; Postgres does the casting on the way in.
+        stage = dbl_quote(f'datum_stage_{uuid4().hex}')
+        stage_cols = ', '.join(f'{dbl_quote(x)} text' for x in fields)
+        select_items = []
+        from_items = [f'{stage} s']
+        for field, type_ in type_map_items:
+            col = 's.' + dbl_quote(field)
+            if type_ == 'geom':
+                geom, lateral = self._geom_from_staging(col, srid, \
+                    multi_geom=self._get_multi_geom(), geom_format=geom_format)
+                select_items.append(geom)
+                from_items.append(lateral)
+            else:
+                select_items.append(f'{col}::{col_types[field]}')
+        fields_joined = ', '.join(dbl_quote(x) for x in fields)
+        insert_stmt = f"""
+            INSERT INTO {self.schema}.{self._name_p} ({fields_joined})
+            SELECT {', '.join(select_items)}
+            FROM {', '.join(from_items)}
+        """
+        insert_stmt += upsert_clause
+        copy_stmt = f'COPY {stage} ({fields_joined}) FROM STDIN'
+        if copy_format == 'binary':
+            copy_stmt += ' WITH (FORMAT binary)'
+            encode = encode_copy_binary
+        else:
+            encode = encode_copy_text
+
+        def val_rows(chunk):
+            for row in chunk:
+                yield [self._copy_val(row[field], type_, geom_format) \
+                    for field, type_ in type_map_items]
+
+        chunks = chunked(rows, chunk_size) if chunk_size else [rows]
+        # Whatever hasn't been committed yet is committed along with dropping
+        # the staging table.
+        commits = CommitInterval(self._save, commit_every)
+        with self.db.shared_cursor() as c:
+            c.execute(f'CREATE TEMP TABLE {stage} ({stage_cols})')
+            try:
+                for chunk in chunks:
+                    # Values are prepared as COPY reads them
+                    stream = IterStream(encode(val_rows(chunk)))
+                    with self.db.timer(self.name, 'write', 'copy'):
+                        c.copy_expert(copy_stmt, stream)
+                    with self.db.timer(self.name, 'write', 'insert') as timer:
+                        c.execute(insert_stmt)
+                        count = timer.rows = c.rowcount
+                    c.execute(f'TRUNCATE {stage}')
+                    commits.chunk_written(count)
+            except Exception:
+                # Clear the failed transaction so the staging table can be
+                # dropped.
+                self.db.rollback()
+                raise
+            finally:
+                c.execute(f'DROP TABLE IF EXISTS {stage}')
+                self._save()
+
+
+    def _get_index_defs(self):
+        """
+        Returns (index name, definition, constraint type) for each index on
+        the table. The constraint type is 'p' or 'u' for indexes backing a
+        primary key or unique constraint, 'x' for an exclusion constraint
+        (whose definition is the constraint's, not the index's), otherwise
+        None.
+        """
+        stmt = f"""
+            SELECT ic.relname AS name,
+                   CASE WHEN con.contype = 'x'
+                        THEN pg_get_constraintdef(con.oid)
+                        ELSE pg_get_indexdef(i.indexrelid) END AS def,
+                   con.contype AS contype
+            FROM   pg_index i
+            JOIN   pg_class ic ON ic.oid = i.indexrelid
+            LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid
+                                       AND con.contype IN ('p', 'u', 'x')
+            WHERE  i.indrelid = '{self.schema}.{self._name_p}'::regclass
+        """
+        return [(x['name'], x['def'], x['contype']) for x in self._exec(stmt)]
+
+    def _write_swap(self, rows, **kwargs):
+        """
+        Replace the contents of the table without readers ever seeing it
+        empty or half-loaded.
+
+        Rows are loaded into a staging copy of the table (with no indexes),
+        the table's indexes, constraints (including foreign keys and
+        exclusion constraints), triggers and row-level security policies are
+        rebuilt on the staging copy, and then the old table is dropped and the
+        staging copy renamed in its place in a single transaction. The owner,
+        grants (with grant options, whoever made them) and serial/identity
+        sequences carry over. Tables that other
+        objects depend on (views, foreign keys) can't be dropped, so the swap
+        fails and the table is left as it was.
+        """
+        schema = self.schema
+        name = self._name_p
+        stage_name = f'{self.name.lower()}_swap_{uuid4().hex[:8]}'
+        stage = f'{schema}.{dbl_quote(stage_name)}'
+        # Identity columns (Postgres 10+) would otherwise come over as plain
+        # NOT NULL columns
+        identity = 'INCLUDING IDENTITY' \
+            if self.db._child._cxn.server_version >= 100000 else ''
+        self._exec(f"""
+            CREATE TABLE {stage} (LIKE {schema}.{name} INCLUDING DEFAULTS
+                INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+                {identity})
+        """)
+        self._save()
+
+        try:
+            sequences = self._exec(f"""
+                SELECT a.attname AS field,
+                       pg_get_serial_sequence('{schema}.{name}', a.attname) AS seq,
+                       pg_get_serial_sequence('{stage}', a.attname) AS stage_seq
+                FROM   pg_attribute a
+                WHERE  a.attrelid = '{schema}.{name}'::regclass
+                AND    a.attnum > 0 AND NOT a.attisdropped
+            """)
+            for x in sequences:
+                if x['stage_seq']:
+                    # An identity column: the staging copy has its own
+                    # sequence, which picks up where the old one left off
+                    self._exec(f"""
+                        SELECT setval('{x['stage_seq']}', last_value, is_called)
+                        FROM   {x['seq']}
+                    """)
+
+            # Load. The staging copy has the same layout, so it can borrow
+            # our metadata instead of looking it up.
+            stage_table = self.db.table(f'{schema}.{stage_name}')._child
+            stage_table._lazy_values = {
+                'metadata':     self.metadata,
+                'geom_type':    self.geom_type,
+                'srid':         self.srid,
+            }
+            stage_table._pk_field = self._pk_field
+            stage_table.write(rows, **kwargs)
+
+            # Build indexes now that the data is in. Index names are unique
+            # per schema, so they get temporary names until the swap.
+            renames = []
+            for index, index_def, contype in self._get_index_defs():
+                temp_index = f'{index[:40]}_{uuid4().hex[:8]}'
+                if contype == 'x':
+                    self._exec(f"""
+                        ALTER TABLE {stage} ADD CONSTRAINT {dbl_quote(temp_index)}
+                        {index_def}
+                    """)
+                    renames.append((index, temp_index, contype))
+                    continue
+                index_def = re.sub(r' INDEX \S+ ON (ONLY )?\S+ ', \
+                    f' INDEX {dbl_quote(temp_index)} ON {stage} ', \
+                    index_def, count=1)
+                self._exec(index_def)
+                if contype:
+                    constraint = 'PRIMARY KEY' if contype == 'p' else 'UNIQUE'
+                    self._exec(f"""
+                        ALTER TABLE {stage} ADD CONSTRAINT {dbl_quote(temp_index)}
+                        {constraint} USING INDEX {dbl_quote(temp_index)}
+                    """)
+                renames.append((index, temp_index, contype))
+
+            # Foreign keys and triggers are named per table, so they keep
+            # their names. Triggers are added after the load so it doesn't
+            # fire them.
+            foreign_keys = self._exec(f"""
+                SELECT conname, pg_get_constraintdef(oid) AS def
+                FROM   pg_constraint
+                WHERE  conrelid = '{schema}.{name}'::regclass
+                AND    contype = 'f'
+            """)
+            for x in foreign_keys:
+                self._exec(f"""
+                    ALTER TABLE {stage} ADD CONSTRAINT {dbl_quote(x['conname'])}
+                    {x['def']}
+                """)
+            triggers = self._exec(f"""
+                SELECT pg_get_triggerdef(oid) AS def
+                FROM   pg_trigger
+                WHERE  tgrelid = '{schema}.{name}'::regclass
+                AND    NOT tgisinternal
+            """)
+            for x in triggers:
+                self._exec(re.sub(r' ON (ONLY )?\S+ ', f' ON {stage} ', \
+                    x['def'], count=1))
+            self._copy_policies(stage)
+            self._exec(f'ANALYZE {stage}')
+            self._save()
+
+            # Swap
+            owner = self._exec(f"""
+                SELECT pg_get_userbyid(relowner) AS owner
+                FROM   pg_class
+                WHERE  oid = '{schema}.{name}'::regclass
+            """)[0]['owner']
+            # Read the ACL itself: information_schema only shows grants the
+            # current role made or received. The owner's own privileges come
+            # with the table.
+            grants = self._exec(f"""
+                SELECT CASE WHEN a.grantee = 0 THEN 'PUBLIC'
+                            ELSE pg_get_userbyid(a.grantee) END AS grantee,
+                       a.privilege_type, a.is_grantable
+                FROM   pg_class c, aclexplode(c.relacl) a
+                WHERE  c.oid = '{schema}.{name}'::regclass
+                AND    a.grantee <> c.relowner
+            """)
+            for x in sequences:
+                if x['seq'] and not x['stage_seq']:
+                    field = dbl_quote(x['field'])
+                    self._exec(f"ALTER SEQUENCE {x['seq']} OWNED BY {stage}.{field}")
+            self._exec(f'DROP TABLE {schema}.{name}')
+            self._exec(f'ALTER TABLE {stage} RENAME TO {name}')
+            for index, temp_index, contype in renames:
+                if contype:
+                    self._exec(f"""
+                        ALTER TABLE {schema}.{name} RENAME CONSTRAINT
+                        {dbl_quote(temp_index)} TO {dbl_quote(index)}
+                    """)
+                else:
+                    self._exec(f"""
+                        ALTER INDEX {schema}.{dbl_quote(temp_index)}
+                        RENAME TO {dbl_quote(index)}
+                    """)
+            for x in grants:
+                # PUBLIC is a keyword, not a role
+                grantee = x['grantee'] if x['grantee'] == 'PUBLIC' \
+                    else dbl_quote(x['grantee'])
+                grant_option = 'WITH GRANT OPTION' if x['is_grantable'] else ''
+                self._exec(f"""
+                    GRANT {x['privilege_type']} ON {schema}.{name}
+                    TO {grantee} {grant_option}
+                """)
+            if owner != self._exec('SELECT current_user AS user')[0]['user']:
+                self._exec(f'ALTER TABLE {schema}.{name} OWNER TO {dbl_quote(owner)}')
             self._save()
+        except Exception:
+            self.db.rollback()
+            self._exec(f'DROP TABLE IF EXISTS {stage}')
+            self._save()
+            raise
+        finally:
+            self.db.invalidate_metadata(table=f'{schema}.{stage_name}')
 
+    def _copy_policies(self, table):
+        """Copy row-level security settings and policies to `table`."""
+        schema = self.schema
+        name = self._name_p
+        flags = self._exec(f"""
+            SELECT relrowsecurity, relforcerowsecurity
+            FROM   pg_class
+            WHERE  oid = '{schema}.{name}'::regclass
+        """)[0]
+        if flags['relrowsecurity']:
+            self._exec(f'ALTER TABLE {table} ENABLE ROW LEVEL SECURITY')
+        if flags['relforcerowsecurity']:
+            self._exec(f'ALTER TABLE {table} FORCE ROW LEVEL SECURITY')
+        policies = self._exec(f"""
+            SELECT policyname, permissive, cmd, qual, with_check,
+                   roles::text[] AS roles
+            FROM   pg_policies
+            WHERE  schemaname = '{schema}'
+            AND    tablename = '{self.name.lower()}'
+        """)
+        for x in policies:
+            # pg_policies gives 'public' for policies on PUBLIC
+            roles = ', '.join('PUBLIC' if role == 'public' else \
+                dbl_quote(role) for role in x['roles'])
+            using = f"USING ({x['qual']})" if x['qual'] else ''
+            check = f"WITH CHECK ({x['with_check']})" \
+                if x['with_check'] else ''
+            self._exec(f"""
+                CREATE POLICY {dbl_quote(x['policyname'])} ON {table}
+                AS {x['permissive']} FOR {x['cmd']} TO {roles} {using} {check}
+            """)
 
     """INDEXES"""
 
+    @contextmanager
+    def bulk_load(self, keep_constraints=True, workers=None, \
+        maintenance_work_mem=None):
+        """
+        Context manager that drops the table's indexes for the duration of a
+        bulk load, then rebuilds them and ANALYZEs the table:
+
+            with table.bulk_load(workers=4, maintenance_work_mem='1GB'):
+                table.write(rows, method='copy')
+
+        Primary key and unique constraints are kept unless `keep_constraints`
+        is False, in which case they're dropped and restored too (and can't
+        be restored if the load added duplicates). Indexes are rebuilt
+        `workers` at a time on separate connections, each with
+        `maintenance_work_mem` if given. They are rebuilt even if the load
+        fails. Each index is rebuilt and committed on its own, so one that
+        fails doesn't stop the rest; a RuntimeError at the end lists the DDL
+        that didn't apply.
+        """
+        table = f'{self.schema}.{self._name_p}'
+        indexes = [x for x in self._get_index_defs() \
+            if not (keep_constraints and x[2])]
+        try:
+            for index, _, contype in indexes:
+                if contype:
+                    self._exec(f'ALTER TABLE {table} DROP CONSTRAINT {dbl_quote(index)}')
+                else:
+                    self._exec(f'DROP INDEX {self.schema}.{dbl_quote(index)}')
+        except Exception:
+            # The drops are one transaction, so this puts them all back
+            self.db.rollback()
+            raise
+        self._save()
+
+        try:
+            yield self
+        except Exception:
+            # Don't leave a failed load's transaction open
+            self.db.rollback()
+            raise
+        finally:
+            failures = self._build_indexes([x[1] for x in indexes \
+                if x[2] != 'x'], workers=workers, \
+                maintenance_work_mem=maintenance_work_mem)
+            failed_defs = {stmt for stmt, _ in failures}
+            # Constraints take an exclusive lock, so add them one at a time
+            for index, index_def, contype in indexes:
+                if contype == 'x':
+                    stmt = f'ALTER TABLE {table} ADD CONSTRAINT {dbl_quote(index)} {index_def}'
+                elif contype:
+                    constraint = 'PRIMARY KEY' if contype == 'p' else 'UNIQUE'
+                    stmt = f'ALTER TABLE {table} ADD CONSTRAINT {dbl_quote(index)} ' \
+                        f'{constraint} USING INDEX {dbl_quote(index)}'
+                    if index_def in failed_defs:
+                        failures.append((stmt, 'Not run: its index failed'))
+                        continue
+                else:
+                    continue
+                error = self._try_exec(stmt)
+                if error:
+                    failures.append((stmt, error))
+            self._exec(f'ANALYZE {table}')
+            self._save()
+            if failures:
+                raise index_rebuild_error(table, failures)
+
+    def _try_exec(self, stmt):
+        """
+        Run a statement on the shared connection and commit it. If it fails,
+        only the statement is rolled back, and the error is returned instead
+        of raised.
+        """
+        with self.db.shared_cursor() as c:
+            c.execute('SAVEPOINT datum_try_exec')
+            try:
+                c.execute(stmt)
+            except Exception as e:
+                c.execute('ROLLBACK TO SAVEPOINT datum_try_exec')
+                return e
+            c.execute('RELEASE SAVEPOINT datum_try_exec')
+        self._save()
+
+    def _build_indexes(self, index_defs, workers=None, \
+        maintenance_work_mem=None):
+        """
+        Run CREATE INDEX statements, `workers` at a time. Each is committed
+        on its own and failures don't stop the rest. Returns (statement,
+        error) for each one that failed.
+        """
+        # Other connections would wait on our open transaction's locks
+        if not workers or workers < 2 or self.db.in_transaction:
+            if maintenance_work_mem:
+                self._exec('SET maintenance_work_mem = %s', \
+                    (str(maintenance_work_mem),))
+            failures = []
+            try:
+                for index_def in index_defs:
+                    error = self._try_exec(index_def)
+                    if error:
+                        failures.append((index_def, error))
+            finally:
+                if maintenance_work_mem:
+                    self._exec('RESET maintenance_work_mem')
+                    self._save()
+            return failures
+
+        def build_on_own_connection(index_def):
+            with self.db.cursor() as c:
+                # LOCAL, so it doesn't stay set on a pooled connection
+                if maintenance_work_mem:
+                    c.execute('SET LOCAL maintenance_work_mem = %s', \
+                        (str(maintenance_work_mem),))
+                c.execute(index_def)
+
+        return run_each(build_on_own_connection, index_defs, workers=workers)
+
     def _name_for_index(self, fields):
         """This is approximately what Postgres will suggest for index names."""
         comps = [self.name] + list(fields) + ['idx']
@@ -0,0 +1,84 @@
+import re
+import struct
+
+# Binary COPY framing. See "Binary Format" in the Postgres COPY docs.
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_BINARY_TRAILER = struct.pack('!h', -1)
+COPY_BINARY_NULL = struct.pack('!i', -1)
+
+COPY_TEXT_ESCAPES = str.maketrans({
+    '\\':   '\\\\',
+    '\t':   '\\t',
+    '\n':   '\\n',
+    '\r':   '\\r',
+})
+
+# psycopg2 placeholders: %s, %(name)s and %% for a literal percent sign
+placeholder_re = re.compile(r'%(?:\((\w+)\))?([s%])')
+
+def to_numbered_params(stmt, params):
+    """
+    Rewrite a statement with psycopg2 placeholders (`%s` or `%(name)s`) to
+    use numbered ones (`$1`) for PREPARE. Returns the statement and the
+    values in order. A named parameter used twice gets one number.
+    """
+    values = []
+    numbers = {}
+
+    def replace(match):
+        name, kind = match.groups()
+        if kind == '%':
+            return '%'
+        if name is None:
+            values.append(params[len(values)])
+            return '${}'.format(len(values))
+        if name not in numbers:
+            values.append(params[name])
+            numbers[name] = len(values)
+        return '${}'.format(numbers[name])
+
+    return placeholder_re.sub(replace, stmt), values
+
+class IterStream(object):
+    """Read-only file-like object over an iterable of bytes. This lets
+    `cursor.copy_expert` pull rows as it needs them."""
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                self._buf += next(self._chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            out, self._buf = self._buf, b''
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+    readline = read
+
+def encode_copy_text(val_rows):
+    """Encode lists of text values (None for NULL) as COPY text lines."""
+    for vals in val_rows:
+        vals = ['\\N' if x is None else x.translate(COPY_TEXT_ESCAPES) \
+            for x in vals]
+        yield ('\t'.join(vals) + '\n').encode('utf-8')
+
+def encode_copy_binary(val_rows):
+    """Encode lists of text values (None for NULL) as binary COPY tuples.
+    Every target column must be of type text."""
+    yield COPY_BINARY_HEADER
+    for vals in val_rows:
+        parts = [struct.pack('!h', len(vals))]
+        for val in vals:
+            if val is None:
+                parts.append(COPY_BINARY_NULL)
+            else:
+                val = val.encode('utf-8')
+                parts.append(struct.pack('!i', len(val)))
+                parts.append(val)
+        yield b''.join(parts)
+    yield COPY_BINARY_TRAILER
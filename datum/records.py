@@ -0,0 +1,107 @@
+from collections import namedtuple
+from itertools import chain
+
+ROW_TYPES = ('dict', 'tuple', 'namedtuple', 'record')
+
+def check_row_type(row_type):
+    if row_type not in ROW_TYPES:
+        raise ValueError("Unknown row type: '{}'".format(row_type))
+
+class Record(tuple):
+    """
+    A read-only row that takes no more memory than a tuple of its values.
+
+    Field names live on the class (see `record_class`), so all the rows from
+    one read share a single name => index map. Values can be looked up by
+    name like a dictionary (`row['name']`, `row.get('name')`), as attributes
+    (`row.name`) or by position. `keys`, `values` and `items` work as they do
+    for dictionaries, so `dict(row)` makes a copy, though iterating a record
+    yields its values like a tuple.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self._fields, self))
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return 'Record({})'.format(', '.join('{}={!r}'.format(field, val) \
+            for field, val in zip(self._fields, self)))
+
+def record_class(fields):
+    """Returns a `Record` subclass for rows with these fields."""
+    fields = tuple(fields)
+    index = {field: i for i, field in enumerate(fields)}
+    return type('Record', (Record,), {
+        '__slots__':    (),
+        '_fields':      fields,
+        '_index':       index,
+    })
+
+def row_factory(row_type, fields):
+    """Returns a function that makes a row of `row_type` from a sequence of
+    values in `fields` order."""
+    check_row_type(row_type)
+    fields = list(fields)
+    if row_type == 'dict':
+        return lambda values: dict(zip(fields, values))
+    elif row_type == 'tuple':
+        return tuple
+    elif row_type == 'namedtuple':
+        return namedtuple('Row', fields, rename=True)._make
+    return record_class(fields)
+
+def field_value(row, field):
+    """Get a field from a dictionary, record or named tuple row."""
+    return row[field] if hasattr(row, 'keys') else getattr(row, field)
+
+def mapping_rows(rows):
+    """
+    Make sure rows to be written can be looked up by field name. Dictionaries
+    and records pass through as they are; named tuples are rewrapped as
+    records, which only copies the tuple. Plain tuples have no field names,
+    so they can't be written.
+    """
+    is_list = isinstance(rows, (list, tuple))
+    if is_list:
+        first = rows[0] if rows else None
+    else:
+        rows = iter(rows)
+        first = next(rows, None)
+        rows = chain([first], rows) if first is not None else []
+    if first is None or hasattr(first, 'keys'):
+        return rows
+    if not hasattr(first, '_fields'):
+        raise TypeError('Rows must be dictionaries, records or named tuples '
+            "to be written (read with row_type='record' rather than 'tuple')")
+    make_record = record_class(first._fields)
+    records = (make_record(row) for row in rows)
+    return list(records) if is_list else records
@@ -0,0 +1,175 @@
+import datetime
+import hashlib
+import json
+import logging
+import math
+import re
+import time
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+wkt_number_re = re.compile(r'-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?')
+wkt_single_re = re.compile(r'^(POINT|LINESTRING|POLYGON)( [ZM]+)?(\(.*\))$')
+wkt_multipoint_re = re.compile(r'^MULTIPOINT( [ZM]+)?\((.*)\)$')
+
+def normalize_wkt(wkt, precision=6, multi=False):
+    """
+    Normalize a WKT string so the same geometry compares equal whichever
+    database it came from: uppercase, no extra whitespace and coordinates
+    rounded to `precision` decimal places. MULTIPOINTs are written without
+    parentheses around each point.
+
+    With `multi`, single geometries are promoted to MULTI, as writing them
+    to a MULTI geometry column does.
+    """
+    if wkt is None:
+        return None
+    if isinstance(wkt, bytes):
+        wkt = wkt.decode()
+    wkt = ' '.join(wkt.upper().split())
+    wkt = re.sub(r'\s*([(),])\s*', r'\1', wkt)
+    def round_number(match):
+        val = round(float(match.group()), precision)
+        return repr(val + 0.0)
+    wkt = wkt_number_re.sub(round_number, wkt)
+    if multi:
+        match = wkt_single_re.match(wkt)
+        if match:
+            geom_type, dims, body = match.groups()
+            wkt = 'MULTI{}{}({})'.format(geom_type, dims or '', body)
+    match = wkt_multipoint_re.match(wkt)
+    if match:
+        dims, body = match.groups()
+        wkt = 'MULTIPOINT{}({})'.format(dims or '', body.replace('(', '')\
+            .replace(')', ''))
+    return wkt
+
+def _normalize_val(val, date_only=False):
+    """
+    Normalize a non-geometry value for hashing. Empty strings count as NULL,
+    since PostGIS writes NULL text as ''. With `date_only`, datetimes are cut
+    to dates, as writing them to a date column does.
+    """
+    if val is None or val == '':
+        return None
+    elif isinstance(val, (Decimal, float)) and math.isfinite(val) and \
+        val == int(val):
+        return int(val)
+    elif isinstance(val, Decimal):
+        return float(val)
+    elif isinstance(val, datetime.datetime) and date_only:
+        return val.date().isoformat()
+    elif isinstance(val, (datetime.date, datetime.datetime)):
+        return val.isoformat()
+    elif isinstance(val, bytes):
+        return val.decode()
+    return val
+
+def _date_fields(row, fields):
+    """Returns the fields holding dates (rather than datetimes) in `row`."""
+    return {x for x in fields if isinstance(row[x], datetime.date) and \
+        not isinstance(row[x], datetime.datetime)}
+
+def row_hash(row, fields, geom_field=None, precision=6, multi=False, \
+    date_fields=None):
+    """
+    Returns a content hash of `fields` (and `geom_field`) in `row`. Datetimes
+    in `date_fields` are compared as dates, and geometries are promoted to
+    MULTI if `multi` is set (see `normalize_wkt`).
+    """
+    date_fields = date_fields or ()
+    vals = [_normalize_val(row[field], date_only=field in date_fields) \
+        for field in fields]
+    if geom_field:
+        vals.append(normalize_wkt(row[geom_field], precision=precision, \
+            multi=multi))
+    data = json.dumps(vals, default=str).encode()
+    return hashlib.md5(data).hexdigest()
+
+def sync(src, dst, key, fields=None, where=None, chunk_size=10000, \
+    precision=6, delete=True, read_kwargs=None, write_kwargs=None):
+    """
+    Bring `dst` in line with `src`, writing only the rows that changed.
+
+    Rows are matched on `key`. Both tables are streamed with `read_iter` and
+    each row is reduced to a hash of its attributes and normalized WKT (see
+    `normalize_wkt`), so only the destination's keys and hashes are held in
+    memory. New and changed rows are upserted into `dst` `chunk_size` at a
+    time; rows missing from `src` are deleted unless `delete` is False.
+
+    `fields` defaults to the destination's non-geometry fields; `where`
+    limits the source rows (and, if `delete` is set, should be one the
+    destination can also evaluate). Geometries are read from `src` in the
+    destination's SRID.
+
+    Returns a dictionary of row counts (inserted, updated, deleted,
+    unchanged) and the elapsed time.
+    """
+    read_kwargs = dict(read_kwargs or {})
+    write_kwargs = dict(write_kwargs or {})
+    start = time.time()
+
+    fields = [x.lower() for x in (fields or dst.non_geom_fields)]
+    if key not in fields:
+        raise ValueError('Key field `{}` is not in the synced fields'\
+            .format(key))
+    geom_field = dst.geom_field
+    multi = bool(geom_field and dst.geom_type and \
+        dst.geom_type.upper().startswith('MULTI'))
+    src_geom_field = src.geom_field.lower() if src.geom_field else None
+    srid = dst.srid
+    to_srid = srid if srid and srid != src.srid else None
+    if srid:
+        write_kwargs.setdefault('from_srid', srid)
+
+    # Hash the destination. Fields that come back as dates are date
+    # columns, so source datetimes are compared to them as dates.
+    dst_hashes = {}
+    date_fields = set()
+    for row in dst.read_iter(fields=fields, where=where, \
+        return_geom=bool(geom_field)):
+        date_fields |= _date_fields(row, fields)
+        hash_ = row_hash(row, fields, geom_field=geom_field, \
+            precision=precision, multi=multi)
+        dst_hashes[_normalize_val(row[key])] = hash_
+    logger.info('Hashed {} rows in {}'.format(len(dst_hashes), dst))
+
+    counts = {
+        'inserted':         0,
+        'updated':          0,
+        'deleted':          0,
+        'unchanged':        0,
+    }
+
+    def changed_rows():
+        rows = src.read_iter(fields=fields, where=where, to_srid=to_srid, \
+            return_geom=bool(geom_field), **read_kwargs)
+        for row in rows:
+            if geom_field and src_geom_field != geom_field:
+                row[geom_field] = row.pop(src_geom_field)
+            hash_ = row_hash(row, fields, geom_field=geom_field, \
+                precision=precision, multi=multi, date_fields=date_fields)
+            dst_hash = dst_hashes.pop(_normalize_val(row[key]), None)
+            if dst_hash is None:
+                counts['inserted'] += 1
+            elif dst_hash != hash_:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            yield row
+
+    dst.write(changed_rows(), chunk_size=chunk_size, mode='upsert', key=key, \
+        **write_kwargs)
+
+    # Whatever is left wasn't in the source
+    if delete and dst_hashes:
+        counts['deleted'] = dst.delete_many(list(dst_hashes), key_field=key)
+
+    elapsed = time.time() - start
+    logger.info('Synced {} to {} in {:.1f}s: {inserted} inserted, '
+        '{updated} updated, {deleted} deleted, {unchanged} unchanged'\
+        .format(src, dst, elapsed, **counts))
+    counts['seconds'] = elapsed
+    return counts
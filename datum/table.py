@@ -1,10 +1,12 @@
-from datum.postgis import Table as PostgisTable
-from datum.oracle_stgeom import Table as OracleStgeomTable
+from datum.util import adapter_module
+from datum.columnar import arrow_to_numpy, column_max
+from datum.instrument import NULL_TIMER
+from datum.records import field_value, mapping_rows
+from datum.watermark import WatermarkStore
 
-TABLE_CLASS_MAP = {
-    'postgis':          PostgisTable,
-    'oracle-stgeom':    OracleStgeomTable,
-}
+# Options of row reads that columnar reads don't have
+ROW_READ_OPTIONS = ('stream', 'row_type', 'geom_format', 'parallel', \
+    'key_field')
 
 class Table(object):
     """Proxy class for tables."""
@@ -21,7 +23,7 @@ class Table(object):
             self.schema = None
             self.name = name
 
-        _ChildTable = TABLE_CLASS_MAP[db.adapter]
+        _ChildTable = adapter_module(db.adapter).Table
         self._child = _ChildTable(self)
 
     def __str__(self):
@@ -46,6 +48,11 @@ class Table(object):
         """Returns the OGC geometry type (e.g. LINESTRING, MULTIPOLYGON)."""
         return self._child.geom_type
 
+    @property
+    def srid(self):
+        """Returns the SRID of the geometry field."""
+        return self._child.srid
+
     @property
     def non_geom_fields(self):
         """Returns all non-geometry fields."""
@@ -65,10 +72,58 @@ class Table(object):
         """Returns a list of field names."""
         return self._child.fields
 
+    def _watermark_key(self, watermark_field):
+        table = '.'.join(x for x in (self.schema, self.name) if x)
+        return '{}|{}.{}'.format(self.db._cache_key, table, \
+            watermark_field).lower()
+
+    def _track_watermark(self, rows, store, key, field):
+        """Pass rows through, noting the highest watermark in the store."""
+        for row in rows:
+            store.track(key, field_value(row, field))
+            yield row
+
+    def _read_since(self, read, since, watermark_field, fields, kwargs):
+        """Read rows newer than `since`, which may be a value or a
+        `WatermarkStore`."""
+        if not isinstance(since, WatermarkStore):
+            return read(since=since, watermark_field=watermark_field, \
+                fields=fields, **kwargs)
+        if not watermark_field:
+            raise ValueError('Reading since a watermark requires a watermark_field')
+        if kwargs.get('row_type') == 'tuple':
+            raise ValueError("Tracking a watermark needs named rows, not "
+                "row_type='tuple'")
+        # Make sure the watermark comes back with the rows
+        if fields and watermark_field not in fields:
+            fields = list(fields) + [watermark_field]
+        store = since
+        key = self._watermark_key(watermark_field)
+        # The name the watermark comes back under
+        name = (kwargs.get('aliases') or {}).get(watermark_field, \
+            watermark_field).lower()
+        rows = read(since=store.get(key), watermark_field=watermark_field, \
+            fields=fields, **kwargs)
+        # Columnar reads
+        if hasattr(rows, 'column_names'):
+            store.track(key, column_max(rows, name))
+            return rows
+        tracked = self._track_watermark(rows, store, key, name)
+        return list(tracked) if isinstance(rows, list) else tracked
+
     def read(self, fields=None, aliases=None, geom_field=None, to_srid=None, \
-        return_geom=True, limit=None, where=None, sort=None, **kwargs):
+        return_geom=True, limit=None, where=None, sort=None, since=None, \
+        watermark_field=None, format='dicts', **kwargs):
         """
         Read rows from the database.
+
+        By default this returns a list of row dictionaries. With
+        `format='arrow'` it returns a pyarrow Table instead, and with
+        `format='numpy'` a dictionary of NumPy arrays (see `read_columns`).
+
+        For large reads, `row_type='record'` returns compact records (see
+        `records.Record`) that can still be indexed by field name, and that
+        `write` accepts as they are.
         
         ```
         Parameters
@@ -79,22 +134,155 @@ class Table(object):
         to_srid : int, optional
         limit : int, optional
         where : str, optional
+        params : dict or sequence, optional
+            Values for bind variables in `where`: `%s` or `%(name)s` for
+            PostGIS, `:name` for Oracle.
         sort : str, optional
+        stream : bool, optional
+            Return a generator of rows instead of a list (see `read_iter`).
+        since : object or WatermarkStore, optional
+            Only return rows whose `watermark_field` is greater than this.
+            Given a `WatermarkStore`, read from the last committed watermark
+            and track the highest value read; call `store.commit()` once the
+            rows have been written.
+        watermark_field : str, optional
+            A monotonically increasing field, such as an edit date or
+            object ID.
+        geom_format : str, optional
+            'wkt' (the default), 'wkb', 'ewkb' or 'shapely'.
+        row_type : str, optional
+            'dict' (the default), 'tuple', 'namedtuple' or 'record'.
+        """
+        if format not in ('dicts', 'arrow', 'numpy'):
+            raise ValueError("Unknown read format: '{}'".format(format))
+        if format != 'dicts':
+            unsupported = [x for x in ROW_READ_OPTIONS \
+                if kwargs.get(x) not in (None, False)]
+            if unsupported:
+                raise ValueError("{} can't be combined with format='{}'"\
+                    .format(', '.join('`{}`'.format(x) for x in unsupported), \
+                    format))
+        read = self._child.read if format == 'dicts' else \
+            self._child.read_arrow
+        # Streamed rows are timed as they're fetched
+        timer = NULL_TIMER if kwargs.get('stream') else \
+            self.db.timer(self.name, 'read', 'total')
+        with timer:
+            rows = self._read_since(read, since, watermark_field, fields, \
+                dict(aliases=aliases, geom_field=geom_field, \
+                return_geom=return_geom, to_srid=to_srid, limit=limit, \
+                where=where, sort=sort, **kwargs))
+            timer.rows = len(rows) if hasattr(rows, '__len__') else None
+        return arrow_to_numpy(rows) if format == 'numpy' else rows
+
+    def read_columns(self, fields=None, **kwargs):
         """
-        return self._child.read(fields=fields, aliases=aliases, \
+        Read rows into columns: a dictionary of field name => NumPy array,
+        with the geometry as WKB. Takes the same parameters as `read`.
+
+        Rows are fetched in batches and built into pyarrow arrays a batch at
+        a time, so there's no per-row dictionary overhead. Use
+        `read(format='arrow')` to get the pyarrow Table itself.
+        """
+        return self.read(fields=fields, format='numpy', **kwargs)
+
+    def read_iter(self, fields=None, aliases=None, geom_field=None, \
+        to_srid=None, return_geom=True, limit=None, where=None, sort=None, \
+        since=None, watermark_field=None, **kwargs):
+        """
+        Lazily read rows from the database, one at a time.
+
+        Takes the same parameters as `read`, plus adapter-specific batch
+        sizing (e.g. `itersize` for PostGIS, `arraysize` and `prefetchrows`
+        for Oracle).
+        """
+        return self._read_since(self._child.read_iter, since, \
+            watermark_field, fields, dict(aliases=aliases, \
             geom_field=geom_field, return_geom=return_geom, to_srid=to_srid, \
-            limit=limit, where=where, sort=sort, **kwargs)
+            limit=limit, where=where, sort=sort, **kwargs))
 
-    def write(self, rows, from_srid=None, chunk_size=None):
-        self._child.write(rows, from_srid=from_srid, chunk_size=chunk_size)
+    def get_many(self, keys, key_field=None, cache=None, **kwargs):
+        """
+        Look up rows by key in batches, instead of one read per key. Returns
+        a dictionary of {key: row} for the keys that were found.
+
+        `key_field` defaults to the primary key (PostGIS) or object ID
+        (Oracle). Pass a `RowCache` as `cache` to keep rows in memory between
+        calls; only keys it doesn't have are read. Other arguments (`fields`,
+        `to_srid`, `row_type`, etc.) are passed to `read`.
+        """
+        if kwargs.get('row_type') == 'tuple':
+            raise ValueError("Looking up rows by key needs named rows, not "
+                "row_type='tuple'")
+        # Drop duplicates, keeping the order
+        keys = list(dict.fromkeys(keys))
+        with self.db.timer(self.name, 'get_many', 'total') as timer:
+            if cache is None:
+                rows = self._child.get_many(keys, key_field=key_field, \
+                    **kwargs)
+            else:
+                # Rows depend on the read options as well as the key
+                scope = (self.db._cache_key, self.schema, self.name, \
+                    key_field, repr(sorted(kwargs.items())))
+                rows, missing = cache.get_many(scope, keys)
+                if missing:
+                    read_rows = self._child.get_many(missing, \
+                        key_field=key_field, **kwargs)
+                    cache.set_many(scope, read_rows)
+                    rows.update(read_rows)
+            timer.rows = len(rows)
+        return {key: rows[key] for key in keys if key in rows}
+
+    def write(self, rows, from_srid=None, chunk_size=None, **kwargs):
+        """
+        Write rows to the database.
+
+        Adapters may accept extra options, e.g. `method='copy'` for PostGIS.
+        Pass `mode='upsert'` to update rows that match on `key` (the primary
+        key or object ID by default) and insert the rest. On PostGIS,
+        `atomic_swap=True` replaces the table's contents without readers
+        seeing it empty or half-loaded.
+
+        Geometries are WKT unless `geom_format` says otherwise ('wkb',
+        'ewkb' or 'shapely').
+
+        Rows can be dictionaries, records or named tuples (see `read`).
+
+        Each chunk is committed as it's written. Pass `commit_every` (a
+        number of rows, or 'end') to commit less often, or write inside
+        `db.transaction()`.
+        """
+        with self.db.timer(self.name, 'write', 'total'):
+            self._child.write(mapping_rows(rows), from_srid=from_srid, \
+                chunk_size=chunk_size, **kwargs)
 
     def delete(self, cascade=False):
         """Delete all rows."""
         return self._child.delete(cascade=cascade)
 
+    def delete_many(self, keys, key_field=None):
+        """
+        Delete rows by key. `key_field` defaults to the primary key (PostGIS)
+        or object ID (Oracle). Returns the number of rows deleted.
+        """
+        return self._child.delete_many(keys, key_field=key_field)
+
 
     """INDEXES"""
 
+    def bulk_load(self, **kwargs):
+        """
+        Context manager that drops the table's indexes while rows are
+        written, then rebuilds them and updates planner statistics:
+
+            with table.bulk_load(workers=4):
+                table.write(rows)
+
+        Pass `workers` to rebuild indexes in parallel. PostGIS also takes
+        `maintenance_work_mem` and `keep_constraints`.
+        """
+        return self._child.bulk_load(**kwargs)
+
     def create_index(self, *fields, **kwargs):
         name = kwargs.get('name')
         self._child.create_index(*fields, name=name)
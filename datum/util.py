@@ -1,10 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from importlib import import_module
+from itertools import islice
+from queue import Queue, Empty, Full
+import threading
 from six.moves.urllib.parse import urlparse
 
 def dbl_quote(text):
     """Place double quotes around a string."""
     return '"{}"'.format(text)
 
+ADAPTER_MODULES = {
+    'postgis':          'datum.postgis',
+    'oracle-stgeom':    'datum.oracle_stgeom',
+}
+
+def adapter_module(adapter):
+    """Returns the package for a database adapter. Adapters import their
+    database driver, so they're only loaded once they're used."""
+    if adapter not in ADAPTER_MODULES:
+        raise ValueError('Unknown database type: {}'.format(adapter))
+    return import_module(ADAPTER_MODULES[adapter])
+
 def parse_url(url):
     p = urlparse(url)
     comps = {
@@ -15,3 +32,171 @@ def parse_url(url):
         'db_name':      p.path[1:] if p.path else None,
     }
     return comps
+
+class CommitInterval(object):
+    """
+    Decides when a chunked write commits. With `commit_every=None` each
+    chunk is committed; with a number, changes are committed once at least
+    that many rows have been written since the last commit; with 'end', only
+    once at the end.
+    """
+    def __init__(self, save, commit_every=None):
+        if not (commit_every in (None, 'end') or \
+            (isinstance(commit_every, int) and commit_every > 0)):
+            raise ValueError("commit_every must be a positive number of rows "
+                "or 'end'")
+        self._save = save
+        self.commit_every = commit_every
+        self._rows = 0
+        self._dirty = False
+
+    def chunk_written(self, count):
+        """Note that a chunk of `count` rows was written."""
+        self._rows += count
+        self._dirty = True
+        if self.commit_every is None or (self.commit_every != 'end' and \
+            self._rows >= self.commit_every):
+            self.commit()
+
+    def commit(self):
+        self._save()
+        self._rows = 0
+        self._dirty = False
+
+    def finish(self):
+        """Commit anything left over."""
+        if self._dirty:
+            self.commit()
+
+def chunked(iterable, size):
+    """Yield successive lists of up to `size` items from any iterable."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Marks the end of a producer's stream on the queue.
+_DONE = object()
+
+class _ProducerError(object):
+    """Carries an exception from a producer thread to the consumer."""
+    def __init__(self, exc):
+        self.exc = exc
+
+def iter_threaded(factories, queue_size=4):
+    """
+    Run each iterator factory in its own thread and yield items from all of
+    them as they arrive, in no particular order across producers.
+
+    The queue holds at most `queue_size` items, so producers block rather
+    than get ahead of the consumer. An exception in any producer is re-raised
+    in the consumer. If the consumer stops early, producers are told to stop
+    at their next item.
+    """
+    queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has stopped listening.
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce(factory):
+        try:
+            for item in factory():
+                if not put(item):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(_ProducerError(e))
+
+    threads = []
+    for factory in factories:
+        thread = threading.Thread(target=produce, args=(factory,), \
+            name='datum-producer')
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    try:
+        remaining = len(threads)
+        while remaining:
+            try:
+                item = queue.get(timeout=0.5)
+            except Empty:
+                if not any(x.is_alive() for x in threads):
+                    raise RuntimeError('Producer threads exited unexpectedly')
+                continue
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _ProducerError):
+                raise item.exc
+            else:
+                yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def key_ranges(lo, hi, n):
+    """Split the integer range [lo, hi] into up to `n` half-open (start, end)
+    ranges of about the same size."""
+    lo, hi = int(lo), int(hi)
+    n = max(1, min(n, hi - lo + 1))
+    bounds = [lo + (hi - lo + 1) * i // n for i in range(n + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def run_each(func, items, workers=None):
+    """
+    Call `func` on each of `items`, `workers` at a time in threads, carrying
+    on past failures. Returns (item, exception) for each item that failed.
+    """
+    def attempt(item):
+        try:
+            func(item)
+        except Exception as e:
+            return item, e
+
+    if workers and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(attempt, items))
+    else:
+        results = [attempt(x) for x in items]
+    return [x for x in results if x]
+
+def index_rebuild_error(table, failures):
+    """Returns an error listing the index DDL in `failures` ((statement,
+    error) pairs) that couldn't be applied, so it can be run by hand."""
+    lines = ['Could not rebuild {} index(es) on {}. This DDL did not apply:'\
+        .format(len(failures), table)]
+    for stmt, error in failures:
+        lines.extend('-- ' + x for x in str(error).strip().splitlines())
+        lines.append(stmt.strip() + ';')
+    return RuntimeError('\n'.join(lines))
+
+GEOM_FORMATS = ('wkt', 'wkb', 'ewkb', 'shapely')
+
+def check_geom_format(geom_format):
+    if geom_format not in GEOM_FORMATS:
+        raise ValueError("Unknown geometry format: '{}'".format(geom_format))
+
+def to_wkb(geom):
+    """Get WKB bytes from a shapely geometry or a bytes-like value."""
+    if geom is None:
+        return None
+    if hasattr(geom, 'wkb'):
+        return geom.wkb
+    return bytes(geom)
+
+def from_wkb_many(wkbs):
+    """Parse a list of WKB values into shapely geometries (None stays None)."""
+    # Shapely is only needed for this format, so import it lazily.
+    import shapely
+    return shapely.from_wkb([to_wkb(x) for x in wkbs]).tolist()
@@ -0,0 +1,140 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from decimal import Decimal
+
+def _encode(value):
+    """Encode a watermark value for JSON, keeping dates and times typed."""
+    if isinstance(value, datetime.datetime):
+        value = {'datetime': value.isoformat()}
+    elif isinstance(value, datetime.date):
+        value = {'date': value.isoformat()}
+    elif isinstance(value, Decimal):
+        value = int(value) if value == int(value) else float(value)
+    return value
+
+def _decode(value):
+    if isinstance(value, dict):
+        if 'datetime' in value:
+            return datetime.datetime.fromisoformat(value['datetime'])
+        elif 'date' in value:
+            return datetime.date.fromisoformat(value['date'])
+    return value
+
+class WatermarkStore(object):
+    """
+    Base class for stores of high-water marks used by incremental reads (see
+    `Table.read`).
+
+    Reads report the highest value they see with `track`, but nothing is
+    persisted until `commit` is called, so a job can commit once its rows
+    have been written and a failed run will re-read the same rows next time.
+    Subclasses implement `_load` and `_store`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key):
+        """Returns the committed watermark for `key`, or None."""
+        return self._load(key)
+
+    def set(self, key, value):
+        """Persist a watermark right away."""
+        self._store({key: value})
+
+    def track(self, key, value):
+        """Note a value seen by a read, keeping the highest per key."""
+        if value is None:
+            return
+        with self._lock:
+            current = self._pending.get(key)
+            if current is None or value > current:
+                self._pending[key] = value
+
+    def commit(self):
+        """Persist the highest values tracked since the last commit."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._store(pending)
+
+    def rollback(self):
+        """Forget values tracked since the last commit."""
+        with self._lock:
+            self._pending = {}
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _store(self, values):
+        raise NotImplementedError
+
+class JsonWatermarkStore(WatermarkStore):
+    """Keeps watermarks in a JSON file."""
+    def __init__(self, path):
+        super(JsonWatermarkStore, self).__init__()
+        self.path = os.path.expanduser(path)
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _load(self, key):
+        data = self._read_file().get(key)
+        return None if data is None else _decode(data)
+
+    def _store(self, values):
+        with self._lock:
+            entries = self._read_file()
+            for key, value in values.items():
+                entries[key] = _encode(value)
+            # Write to a temp file and rename so a crash can't leave a
+            # half-written file behind.
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+class SqliteWatermarkStore(WatermarkStore):
+    """Keeps watermarks in a SQLite database."""
+    def __init__(self, path):
+        super(SqliteWatermarkStore, self).__init__()
+        self.path = os.path.expanduser(path)
+        cxn = self._connect()
+        try:
+            with cxn:
+                cxn.execute('''
+                    CREATE TABLE IF NOT EXISTS watermarks (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    )
+                ''')
+        finally:
+            cxn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def _load(self, key):
+        cxn = self._connect()
+        try:
+            row = cxn.execute('SELECT value FROM watermarks WHERE key = ?', \
+                (key,)).fetchone()
+        finally:
+            cxn.close()
+        return None if row is None else _decode(json.loads(row[0]))
+
+    def _store(self, values):
+        cxn = self._connect()
+        try:
+            with cxn:
+                cxn.executemany('INSERT OR REPLACE INTO watermarks VALUES (?, ?)', \
+                    [(key, json.dumps(_encode(value))) \
+                    for key, value in values.items()])
+        finally:
+            cxn.close()
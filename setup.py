@@ -10,7 +10,8 @@ setup(name='datum',
       packages=find_packages(),
       install_requires=['six==1.10.0'],
       extras_require={
-        'oracle_stgeom': ['cx-Oracle==5.2.1', 'pyproj==1.9.5.1'],
-        'postgis': ['psycopg2==2.6.1'],
+        'oracle_stgeom': ['cx-Oracle==5.2.1', 'pyproj>=2.2', 'shapely>=2.1'],
+        'postgis': ['psycopg2>=2.7'],
+        'arrow': ['pyarrow>=14', 'numpy'],
       },
       zip_safe=False)
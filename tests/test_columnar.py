@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from datum.columnar import batches_to_arrow
+
+
+def test_batches_with_different_decimal_precision():
+    # Postgres numeric infers decimal128(2, 1) here and decimal128(7, 2) in
+    # the next batch
+    batches = [[(1, Decimal('1.5'))], [(2, Decimal('12345.25'))]]
+
+    table = batches_to_arrow(batches, ['id', 'area'])
+
+    assert table.column('area').to_pylist() == \
+        [Decimal('1.5'), Decimal('12345.25')]
+
+
+def test_batches_with_ints_then_floats():
+    # Oracle NUMBER comes back as int in one batch and float in the next
+    batches = [[(1, 10)], [(2, 2.5)], [(3, None)]]
+
+    table = batches_to_arrow(batches, ['id', 'area'])
+
+    assert table.schema.field('area').type == pa.float64()
+    assert table.column('area').to_pylist() == [10.0, 2.5, None]
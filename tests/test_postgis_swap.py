@@ -0,0 +1,73 @@
+"""
+Tests against a real Postgres database. Set DATUM_TEST_POSTGIS_URL (e.g.
+postgis://postgres@localhost/datum_test) to a database where the user can
+create roles; they're skipped otherwise.
+"""
+import os
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip('cx_Oracle')
+pytest.importorskip('psycopg2')
+
+import datum
+
+URL = os.environ.get('DATUM_TEST_POSTGIS_URL')
+
+pytestmark = pytest.mark.skipif(not URL, \
+    reason='DATUM_TEST_POSTGIS_URL is not set')
+
+
+@pytest.fixture
+def db():
+    db = datum.connect(URL)
+    yield db
+    db.rollback()
+    db.close()
+
+
+@pytest.fixture
+def roles(db):
+    suffix = uuid4().hex[:8]
+    grantor = f'datum_grantor_{suffix}'
+    reader = f'datum_reader_{suffix}'
+    for role in (grantor, reader):
+        db.execute(f'CREATE ROLE {role}')
+    db.save()
+    yield grantor, reader
+    db.rollback()
+    for role in (grantor, reader):
+        db.execute(f'DROP OWNED BY {role}')
+        db.execute(f'DROP ROLE {role}')
+    db.save()
+
+
+def test_swap_keeps_grants(db, roles):
+    grantor, reader = roles
+    name = f'datum_swap_{uuid4().hex[:8]}'
+    db.execute(f'CREATE TABLE {name} (id int PRIMARY KEY, name text)')
+    db.execute(f'GRANT SELECT ON {name} TO {grantor} WITH GRANT OPTION')
+    # A grant the current role didn't make
+    db.execute(f'SET ROLE {grantor}')
+    db.execute(f'GRANT SELECT ON {name} TO {reader}')
+    db.execute('RESET ROLE')
+    db.save()
+
+    try:
+        table = db.table(name)
+        table.write([{'id': 1, 'name': 'one'}], atomic_swap=True)
+
+        def has_privilege(role, privilege):
+            stmt = f"SELECT has_table_privilege('{role}', '{name}', " \
+                f"'{privilege}') AS ok"
+            return db.execute(stmt)[0]['ok']
+
+        assert has_privilege(reader, 'SELECT')
+        assert has_privilege(grantor, 'SELECT WITH GRANT OPTION')
+        assert not has_privilege(reader, 'SELECT WITH GRANT OPTION')
+        assert [x['id'] for x in table.read()] == [1]
+    finally:
+        db.rollback()
+        db.execute(f'DROP TABLE IF EXISTS {name}')
+        db.save()
@@ -0,0 +1,70 @@
+import pytest
+
+from datum.instrument import NULL_TIMER
+from datum.table import Table
+from datum.watermark import JsonWatermarkStore
+
+
+@pytest.mark.parametrize('format', ('arrow', 'numpy'))
+@pytest.mark.parametrize('kwargs, names', [
+    ({'stream': True}, '`stream`'),
+    ({'row_type': 'tuple'}, '`row_type`'),
+    ({'geom_format': 'wkb', 'stream': True}, '`stream`, `geom_format`'),
+])
+def test_columnar_read_rejects_row_options(format, kwargs, names):
+    # The check happens before the table is touched
+    table = Table.__new__(Table)
+
+    with pytest.raises(ValueError) as excinfo:
+        table.read(format=format, **kwargs)
+
+    assert str(excinfo.value) == \
+        "{} can't be combined with format='{}'".format(names, format)
+
+
+class FakeDatabase:
+    _cache_key = 'fake'
+
+    def timer(self, *args, **kwargs):
+        return NULL_TIMER
+
+
+class FakeChild:
+    """Returns rows the way an adapter does, with aliases applied."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def read(self, aliases=None, **kwargs):
+        self.calls.append(dict(kwargs, aliases=aliases))
+        return [{(aliases or {}).get(k, k): v for k, v in row.items()} \
+            for row in self.rows]
+
+
+def make_table(rows):
+    table = Table.__new__(Table)
+    table.db = FakeDatabase()
+    table.schema = None
+    table.name = 'parcels'
+    table._child = FakeChild(rows)
+    return table
+
+
+def test_watermark_read_with_aliased_field(tmp_path):
+    store = JsonWatermarkStore(str(tmp_path / 'watermarks.json'))
+    table = make_table([
+        {'id': 1, 'edited': 10},
+        {'id': 2, 'edited': 30},
+    ])
+
+    rows = table.read(fields=['id', 'edited'], aliases={'edited': 'changed'}, \
+        since=store, watermark_field='edited')
+    store.commit()
+
+    assert [x['changed'] for x in rows] == [10, 30]
+    assert store.get(table._watermark_key('edited')) == 30
+    # The next read picks up from there
+    table.read(since=store, watermark_field='edited', \
+        aliases={'edited': 'changed'})
+    assert table._child.calls[-1]['since'] == 30